@@ -1,6 +1,7 @@
 import pygame
 from enum import Enum
 from collections import deque
+from event_log import events
 from map import CellType
 
 class AttackerState(Enum):
@@ -9,41 +10,78 @@ class AttackerState(Enum):
     ELIMINATED = 3
     REACHED_END = 4
 
+class MacroAction(Enum):
+    # Ações estendidas no tempo, executadas por passos roteirizados. Os ids
+    # seguem as 4 direções (0-3) das ações primitivas, sem colidir na tabela Q
+    FOLLOW_FLOW = 4     # Segue o campo de fluxo em direção ao END
+    SEEK_SAFE_CELL = 5  # Vai até a célula mais próxima sem torres por perto
+    RETREAT = 6         # Afasta-se das torres
+
 class Attacker:
-    def __init__(self, start_x, start_y, game_map, q_learning_agent):
+    __slots__ = (
+        'grid_x', 'grid_y', 'pixel_x', 'pixel_y', 'game_map', 'q_agent',
+        'stuck_time', 'last_position', 'health', 'state', 'observed_attacks',
+        'last_state', 'last_action', 'player_controlled', 'player_target',
+        'last_positions', 'last_distance', 'adjacent_tower_time',
+        'use_macro_actions', 'macro_length', 'current_macro', 'macro_start_state',
+        'macro_steps', 'macro_reward', 'macro_path', 'slot_index'
+    )
+
+    # Atributos iguais para todos os atacantes ficam na classe
+    max_health = 100
+    speed = 1.0
+    damage = 10
+    stuck_penalty = -10  # penalidade mais forte por ficar parado
+    max_stuck_time = 5  # 5 segundos max preso antes de ser removido
+    color = (255, 100, 100)
+    size = 15
+
+    def __init__(self, start_x, start_y, game_map, q_learning_agent, use_macro_actions=False, macro_length=5):
+        self.game_map = game_map
+
+        # Armazena a referência ao agente de IA compartilhado
+        self.q_agent = q_learning_agent
+
+        self.observed_attacks = {}  # Registra posicoes perigosas
+        self.last_positions = deque(maxlen=12)  # Evita loops mais longos
+        self.macro_path = deque()
+
+        # Posição na lista de atacantes vivos (remoção O(1) por troca)
+        self.slot_index = None
+
+        self.reset(start_x, start_y, use_macro_actions, macro_length)
+
+    def reset(self, start_x, start_y, use_macro_actions=False, macro_length=5):
+        # Reinicia o estado de uma vida; usado também ao reciclar atacantes do pool
         self.grid_x = start_x
         self.grid_y = start_y
-        self.pixel_x, self.pixel_y = game_map.grid_to_pixel(start_x, start_y)
-        self.game_map = game_map
-        self.stuck_time = 0
-        self.max_stuck_time = 2  # inimigos eliminados mais rápido se ficarem presos
-        self.stuck_penalty = -10  # penalidade mais forte por ficar parado
+        self.pixel_x, self.pixel_y = self.game_map.grid_to_pixel(start_x, start_y)
+        self.stuck_time = 0  # Tempo que o atacante está preso
         self.last_position = None
 
-        self.max_health = 100
         self.health = self.max_health
-        self.speed = 1.0
-        self.damage = 10
         self.state = AttackerState.MOVING
 
-        self.observed_attacks = {}  # Registra posicoes perigosas
+        self.observed_attacks.clear()
 
-        # Armazena a referência ao agente de IA compartilhado
-        self.q_agent = q_learning_agent
         self.last_state = None
         self.last_action = None
 
         self.player_controlled = False
         self.player_target = None
 
-        self.last_positions = deque(maxlen=12)  # Evita loops mais longos
+        self.last_positions.clear()
         self.last_distance = float('inf')  # Para calcular progresso
-        
-        self.color = (255, 100, 100)
-        self.size = 15
+        self.adjacent_tower_time = 0  # Tempo acumulado ao lado de torres
 
-        self.stuck_time = 0  # Tempo que o atacante está preso
-        self.max_stuck_time = 5  # 5 segundos max preso antes de ser removido
+        # Macro-ações (decisões do agente apenas nas fronteiras das macros)
+        self.use_macro_actions = use_macro_actions
+        self.macro_length = macro_length  # Máximo de células por macro-ação
+        self.current_macro = None
+        self.macro_start_state = None
+        self.macro_steps = 0
+        self.macro_reward = 0.0
+        self.macro_path.clear()
 
     def get_state(self):
         
@@ -141,8 +179,6 @@ class Attacker:
 
         # Penalidade extra se ficar várias iterações próximo de torre
         if adjacent_tower_count > 0:
-            if not hasattr(self, 'adjacent_tower_time'):
-                self.adjacent_tower_time = 0
             self.adjacent_tower_time += 1/60
             if self.adjacent_tower_time > 1:  # 1 segundo perto de torre
                 reward -= 40 * self.adjacent_tower_time  # Penalidade progressiva
@@ -195,33 +231,29 @@ class Attacker:
         return safety
 
     def update(self):
+        if self.use_macro_actions:
+            return self.update_macro()
+
         if self.state in [AttackerState.ELIMINATED, AttackerState.REACHED_END]:
             return self.state.name.lower()
 
         current_pos = (self.grid_x, self.grid_y)
 
-        
-        if not hasattr(self, 'last_position'):
-            self.last_position = current_pos
-            self.stuck_time = 0
-
-        
         is_stuck = (current_pos == self.last_position) or (self.last_positions and current_pos in self.last_positions)
 
         if is_stuck:
             self.stuck_time += 1/60  
             # Penalidade progressiva
-            if hasattr(self, 'last_action'):
-                penalty = self.stuck_penalty * (1 + self.stuck_time)
-                self.q_agent.update_q_value(
-                    self.get_state(),
-                    self.last_action,
-                    penalty,
-                    self.get_state(),
-                    self.get_possible_actions()
-                )
+            penalty = self.stuck_penalty * (1 + self.stuck_time)
+            self.q_agent.update_q_value(
+                self.get_state(),
+                self.last_action,
+                penalty,
+                self.get_state(),
+                self.get_possible_actions()
+            )
             if self.stuck_time > self.max_stuck_time:
-                print(f"Atacante eliminado por inatividade em {current_pos}")
+                events.info('attacker_stuck', "Atacante eliminado por inatividade em {position}", position=current_pos)
                 self.state = AttackerState.ELIMINATED
                 return "eliminated"
         else:
@@ -240,18 +272,7 @@ class Attacker:
         possible_actions = self.get_possible_actions()
 
         if not possible_actions:
-            # Tenta qualquer direção livre, mesmo que já tenha passado por lá
-            directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]
-            for i, (dx, dy) in enumerate(directions):
-                new_x, new_y = self.grid_x + dx, self.grid_y + dy
-                if 0 <= new_x < self.game_map.width and 0 <= new_y < self.game_map.height:
-                    cell = self.game_map.get_cell(new_x, new_y)
-                    if cell.name not in ['OBSTACLE', 'TOWER']:
-                        # Permite repetir posição para destravar
-                        self.grid_x, self.grid_y = new_x, new_y
-                        self.pixel_x, self.pixel_y = self.game_map.grid_to_pixel(new_x, new_y)
-                        self.last_positions.append((new_x, new_y))
-                        break
+            self.move_to_any_free_cell()
             return
 
         # O agente de IA escolhe a ação
@@ -277,6 +298,190 @@ class Attacker:
         if self.health <= 0:
             self.state = AttackerState.ELIMINATED
 
+    def get_possible_macro_actions(self):
+        actions = []
+        flow = self.game_map.get_flow_field()
+        if any(flow[ny][nx] != float('inf') for nx, ny in self.game_map.get_neighbors(self.grid_x, self.grid_y)):
+            actions.append(MacroAction.FOLLOW_FLOW.value)
+        if not self._is_tower_free(self.grid_x, self.grid_y):
+            actions.append(MacroAction.SEEK_SAFE_CELL.value)
+            actions.append(MacroAction.RETREAT.value)
+        return actions
+
+    def _is_tower_free(self, x, y):
+        # Mesma janela 5x5 usada no nível de perigo de get_state
+        for dx in [-2,-1,0,1,2]:
+            for dy in [-2,-1,0,1,2]:
+                if self.game_map.get_cell(x + dx, y + dy) == CellType.TOWER:
+                    return False
+        return True
+
+    def _find_safe_path(self):
+        # BFS até a célula livre de torres mais próxima
+        start = (self.grid_x, self.grid_y)
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            pos = queue.popleft()
+            if pos != start and self._is_tower_free(*pos):
+                path = deque()
+                while pos != start:
+                    path.appendleft(pos)
+                    pos = parents[pos]
+                return path
+            for neighbor in self.game_map.get_neighbors(*pos):
+                if neighbor not in parents:
+                    parents[neighbor] = pos
+                    queue.append(neighbor)
+        return deque()
+
+    def _move_to(self, new_x, new_y):
+        self.grid_x, self.grid_y = new_x, new_y
+        self.pixel_x, self.pixel_y = self.game_map.grid_to_pixel(new_x, new_y)
+        self.last_positions.append((new_x, new_y))
+
+    def _start_macro(self):
+        possible_macros = self.get_possible_macro_actions()
+        if not possible_macros:
+            return False
+
+        self.macro_start_state = self.get_state()
+        self.current_macro = MacroAction(self.q_agent.choose_action(self.macro_start_state, possible_macros))
+        self.macro_steps = 0
+        self.macro_reward = 0.0
+        self.macro_path.clear()
+        if self.current_macro == MacroAction.SEEK_SAFE_CELL:
+            self.macro_path.extend(self._find_safe_path())
+        return True
+
+    def _step_macro(self):
+        # Um tick da macro-ação: anda, atualiza o estado do atacante e soma a
+        # recompensa do tick, descontada por gamma^k (k = ticks já executados)
+        moved = self._macro_move()
+        if moved:
+            self.stuck_time = 0
+        else:
+            self.stuck_time += 1/60
+            if self.stuck_time > self.max_stuck_time:
+                events.info('attacker_stuck', "Atacante eliminado por inatividade em {position}", position=(self.grid_x, self.grid_y))
+                self.state = AttackerState.ELIMINATED
+
+        if self.state != AttackerState.ELIMINATED:
+            current_cell_type = self.game_map.get_cell(self.grid_x, self.grid_y)
+            if current_cell_type == CellType.END:
+                self.state = AttackerState.REACHED_END
+            if self.health <= 0:
+                self.state = AttackerState.ELIMINATED
+
+        self.macro_reward += self.q_agent.discount_factor ** self.macro_steps * self.calculate_reward()
+        self.macro_steps += 1
+        return moved
+
+    def _macro_move(self):
+        # Um passo roteirizado da macro-ação atual; retorna False se não conseguiu andar
+        if self.current_macro == MacroAction.FOLLOW_FLOW:
+            flow = self.game_map.get_flow_field()
+            neighbors = self.game_map.get_neighbors(self.grid_x, self.grid_y)
+            if not neighbors:
+                return False
+            # Prefere posições não visitadas recentemente em caso de empate
+            best = min(neighbors, key=lambda n: (flow[n[1]][n[0]], n in self.last_positions))
+            if flow[best[1]][best[0]] == float('inf'):
+                return False
+            self._move_to(*best)
+            return True
+
+        if self.current_macro == MacroAction.SEEK_SAFE_CELL:
+            if not self.macro_path:
+                return False
+            next_x, next_y = self.macro_path.popleft()
+            if self.game_map.get_cell(next_x, next_y) in [CellType.OBSTACLE, CellType.TOWER]:
+                return False
+            self._move_to(next_x, next_y)
+            return True
+
+        if self.current_macro == MacroAction.RETREAT:
+            best_dir = None
+            max_safety = float('-inf')
+            for dx, dy in [(0, -1), (1, 0), (0, 1), (-1, 0)]:
+                nx, ny = self.grid_x + dx, self.grid_y + dy
+                cell = self.game_map.get_cell(nx, ny)
+                if cell is not None and cell not in [CellType.OBSTACLE, CellType.TOWER]:
+                    safety = self._tower_avoidance((dx, dy))
+                    if safety > max_safety:
+                        max_safety = safety
+                        best_dir = (dx, dy)
+            if best_dir is None:
+                return False
+            self._move_to(self.grid_x + best_dir[0], self.grid_y + best_dir[1])
+            return True
+
+        return False
+
+    def _finish_macro(self):
+        # Atualização SMDP: uma única atualização Q por macro-ação, com a soma
+        # descontada das recompensas dos ticks e o valor futuro descontado pela duração
+        next_state = self.get_state()
+        next_actions = []
+        if self.state not in [AttackerState.ELIMINATED, AttackerState.REACHED_END]:
+            next_actions = self.get_possible_macro_actions()
+        self.q_agent.update_q_value(
+            self.macro_start_state,
+            self.current_macro.value,
+            self.macro_reward,
+            next_state,
+            next_actions,
+            duration=max(self.macro_steps, 1)
+        )
+        self.current_macro = None
+        self.macro_path.clear()
+
+    def update_macro(self):
+        if self.state in [AttackerState.ELIMINATED, AttackerState.REACHED_END]:
+            return self.state.name.lower()
+
+        if self.current_macro is None and not self._start_macro():
+            self.stuck_time += 1/60
+            if self.stuck_time > self.max_stuck_time:
+                events.info('attacker_stuck', "Atacante eliminado por inatividade em {position}", position=(self.grid_x, self.grid_y))
+                self.state = AttackerState.ELIMINATED
+                return "eliminated"
+            return
+
+        moved = self._step_macro()
+        terminal = self.state in [AttackerState.ELIMINATED, AttackerState.REACHED_END]
+        if terminal or not moved or self.macro_steps >= self.macro_length:
+            self._finish_macro()
+        if self.stuck_time > self.max_stuck_time:
+            return "eliminated"
+
+    def clone(self, game_map, q_learning_agent):
+        # Cópia independente do estado atual, ligada a outro mapa/agente (simulação)
+        attacker = Attacker.__new__(Attacker)
+        for name in Attacker.__slots__:
+            setattr(attacker, name, getattr(self, name))
+        attacker.game_map = game_map
+        attacker.q_agent = q_learning_agent
+        attacker.observed_attacks = dict(self.observed_attacks)
+        attacker.last_positions = deque(self.last_positions, maxlen=self.last_positions.maxlen)
+        attacker.macro_path = deque(self.macro_path)
+        attacker.slot_index = None
+        return attacker
+
+    def move_to_any_free_cell(self):
+        # Tenta qualquer direção livre, mesmo que já tenha passado por lá
+        directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+        for i, (dx, dy) in enumerate(directions):
+            new_x, new_y = self.grid_x + dx, self.grid_y + dy
+            if 0 <= new_x < self.game_map.width and 0 <= new_y < self.game_map.height:
+                cell = self.game_map.get_cell(new_x, new_y)
+                if cell.name not in ['OBSTACLE', 'TOWER']:
+                    # Permite repetir posição para destravar
+                    self.grid_x, self.grid_y = new_x, new_y
+                    self.pixel_x, self.pixel_y = self.game_map.grid_to_pixel(new_x, new_y)
+                    self.last_positions.append((new_x, new_y))
+                    break
+
     def take_damage(self, damage):
         self.health -= damage
         # Registra posição perigosa
@@ -299,3 +504,31 @@ class Attacker:
             pygame.draw.rect(screen, (255, 0, 0), (bar_x, bar_y, bar_width, bar_height))
             health_width = int((self.health / self.max_health) * bar_width)
             pygame.draw.rect(screen, (0, 255, 0), (bar_x, bar_y, health_width, bar_height))
+
+
+class AttackerPool:
+    # Lista livre de atacantes mortos, reciclados no próximo spawn
+    def __init__(self, game_map, q_learning_agent):
+        self.game_map = game_map
+        self.q_agent = q_learning_agent
+        self.free = []
+
+    def acquire(self, start_x, start_y, use_macro_actions=False, macro_length=5):
+        if self.free:
+            attacker = self.free.pop()
+            attacker.reset(start_x, start_y, use_macro_actions, macro_length)
+            return attacker
+        return Attacker(start_x, start_y, self.game_map, self.q_agent, use_macro_actions, macro_length)
+
+    def release(self, attacker):
+        attacker.slot_index = None
+        # Atacante morto não precisa do histórico até ser reciclado
+        attacker.observed_attacks.clear()
+        attacker.last_positions.clear()
+        self.free.append(attacker)
+
+    def compact(self, keep=0):
+        # Descarta atacantes reciclados além de keep; retorna quantos saíram
+        released = max(len(self.free) - keep, 0)
+        del self.free[keep:]
+        return released
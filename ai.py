@@ -3,20 +3,29 @@ import numpy as np
 import pickle
 import os
 from collections import defaultdict
+from fitness_cache import shared_fitness_cache, environment_fingerprint
+from ga_engine import GenomeEngine, EMPTY, encode_cells, decode_cell
 
 class QLearningAgent:
 
     
-    def __init__(self, learning_rate=0.2, discount_factor=0.95, epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.05):
+    def __init__(self, learning_rate=0.2, discount_factor=0.95, epsilon=1.0, epsilon_decay=0.995, epsilon_min=0.05, q_table_file="q_table.pkl"):
         self.learning_rate = learning_rate
         self.discount_factor = discount_factor
         self.epsilon = epsilon
         self.epsilon_decay = epsilon_decay
         self.epsilon_min = epsilon_min
         self.q_table = defaultdict(lambda: defaultdict(float))
+        self.rng = None  # Gerador da exploração; None = módulo random (simulações passam um próprio)
+        self.revision = 0  # Muda a cada alteração da tabela Q (chave de caches de rollouts)
+
+        # Política congelada: escolhe ações mas não aprende (ex.: planejamento)
+        self.frozen = False
         
-        self.q_table_file = "q_table.pkl"
-        self.load_q_table()
+        # q_table_file=None mantém a tabela só em memória (ex.: simulações)
+        self.q_table_file = q_table_file
+        if self.q_table_file:
+            self.load_q_table()
 
     def decay_epsilon(self):
         
@@ -29,10 +38,11 @@ class QLearningAgent:
     def choose_action(self, state, possible_actions):
         
         state_key = self.get_state_key(state)
+        rng = self.rng if self.rng is not None else random
         
-        if random.random() < self.epsilon:
+        if rng.random() < self.epsilon:
             
-            return random.choice(possible_actions)
+            return rng.choice(possible_actions)
         else:
             
             best_action = possible_actions[0]
@@ -46,8 +56,11 @@ class QLearningAgent:
             
             return best_action
     
-    def update_q_value(self, state, action, reward, next_state, next_possible_actions):
-        
+    def update_q_value(self, state, action, reward, next_state, next_possible_actions, duration=1):
+        # duration > 1 corresponde a uma macro-ação (atualização SMDP): o valor
+        # futuro é descontado pelo número de ticks que a macro-ação durou
+        if self.frozen:
+            return
         state_key = self.get_state_key(state)
         next_state_key = self.get_state_key(next_state)
         
@@ -60,10 +73,14 @@ class QLearningAgent:
             max_next_q = max([self.q_table[next_state_key][a] for a in next_possible_actions])
         
         # Atualizar Q-value
-        new_q = current_q + self.learning_rate * (reward + self.discount_factor * max_next_q - current_q)
+        discount = self.discount_factor ** duration
+        new_q = current_q + self.learning_rate * (reward + discount * max_next_q - current_q)
         self.q_table[state_key][action] = new_q
+        self.revision += 1
     
     def save_q_table(self):
+        if not self.q_table_file:
+            return
         try:
             with open(self.q_table_file, 'wb') as f:
                 pickle.dump(dict(self.q_table), f)
@@ -77,10 +94,24 @@ class QLearningAgent:
                 with open(self.q_table_file, 'rb') as f:
                     loaded_table = pickle.load(f)
                     self.q_table = defaultdict(lambda: defaultdict(float), loaded_table)
+                    self.revision += 1
                 print("Tabela Q carregada com sucesso")
         except Exception as e:
             print(f"Erro ao carregar tabela Q: {e}")
     
+    def compact_q_table(self):
+        # Remove valores Q nunca aprendidos (0.0, criados só por consultas); o
+        # defaultdict devolve o mesmo 0.0, então as decisões não mudam
+        removed = 0
+        for state_key in list(self.q_table.keys()):
+            actions = self.q_table[state_key]
+            for action in [a for a, value in actions.items() if value == 0.0]:
+                del actions[action]
+                removed += 1
+            if not actions:
+                del self.q_table[state_key]
+        return removed
+
     def get_stats(self):
         
         total_states = len(self.q_table)
@@ -94,53 +125,68 @@ class QLearningAgent:
         }
 
 class GeneticAlgorithmOptimizer:
+    # Adaptador de GenomeEngine para layouts no formato {'towers': [{'x', 'y', 'type'}]}
     
+    TOWER_TYPES = ['CANNON', 'MISSILE', 'LASER']
+    MAX_TOWERS = 8
     
-    def __init__(self, population_size=20, mutation_rate=0.1, crossover_rate=0.7):
+    def __init__(self, population_size=20, mutation_rate=0.1, crossover_rate=0.7, patience=None):
         self.population_size = population_size
         self.mutation_rate = mutation_rate
         self.crossover_rate = crossover_rate
         self.generation = 0
         self.best_fitness_history = []
+
+        self.engine = GenomeEngine(
+            num_genes=self.MAX_TOWERS, num_types=len(self.TOWER_TYPES), population_size=population_size,
+            mutation_rate=mutation_rate, crossover_rate=crossover_rate, type_mutation_rate=mutation_rate,
+            resize_rate=mutation_rate, min_genes=1, elite=1, patience=patience
+        )
+
+        # Avaliador opcional por rollouts (simulation.LayoutEvaluator); sem ele,
+        # todos os indivíduos usam os mesmos simulation_results
+        self.evaluator = None
+
+        # Modelo substituto opcional (surrogate_model.SurrogateModel): com ele,
+        # só a melhor fração prevista de cada geração vai para os rollouts
+        self.surrogate = None
+
+    def encode(self, population, game_map):
+        genomes = np.full((len(population), self.MAX_TOWERS, 2), EMPTY, dtype=np.int64)
+        genomes[:, :, 1] = 0
+        for i, individual in enumerate(population):
+            for j, tower in enumerate(individual['towers'][:self.MAX_TOWERS]):
+                genomes[i, j] = (tower['y'] * game_map.width + tower['x'], self.TOWER_TYPES.index(tower['type']))
+        return genomes
+
+    def decode(self, genome, game_map, fitness=0):
+        towers = []
+        for cell, tower_type in genome.tolist():
+            if cell != EMPTY:
+                x, y = decode_cell(cell, game_map.width)
+                towers.append({'x': x, 'y': y, 'type': self.TOWER_TYPES[tower_type]})
+        return {'towers': towers, 'fitness': fitness}
         
     def create_individual(self, game_map):
         
-        individual = {
-            'towers': [],
-            'fitness': 0
-        }
-        
-        num_towers = random.randint(3, 8)
-        
-        for _ in range(num_towers):
-            attempts = 0
-            while attempts < 50:
-                x = random.randint(0, game_map.width - 1)
-                y = random.randint(0, game_map.height - 1)
-                
-                if game_map.can_place_tower(x, y):
-                    tower_type = random.choice(['CANNON', 'MISSILE', 'LASER'])
-                    individual['towers'].append({
-                        'x': x,
-                        'y': y,
-                        'type': tower_type
-                    })
-                    break
-                
-                attempts += 1
-        
-        return individual
+        return self.create_population(game_map, size=1)[0]
     
-    def create_population(self, game_map):
+    def create_population(self, game_map, size=None):
         
-        population = []
-        for _ in range(self.population_size):
-            individual = self.create_individual(game_map)
-            population.append(individual)
-        return population
+        candidates = encode_cells(game_map.placement_cells(), game_map.width)
+        genomes = self.engine.random_population(candidates, size=size, min_genes=3, max_genes=self.MAX_TOWERS)
+        return [self.decode(genome, game_map) for genome in genomes]
     
     def evaluate_fitness(self, individual, simulation_results):
         
+        key = shared_fitness_cache.key(
+            'optimizer', environment_fingerprint(extra=simulation_results), individual['towers']
+        )
+        cached = shared_fitness_cache.get(key)
+        if cached is not None:
+            individual['fitness'] = cached
+            return cached
+
         fitness = 0
         
         # Fitness baseado nos resultados da simulação
@@ -165,6 +211,7 @@ class GeneticAlgorithmOptimizer:
         fitness += coverage_bonus
         
         individual['fitness'] = max(0, fitness)  # Fitness não pode ser negativo
+        shared_fitness_cache.put(key, individual['fitness'])
         return individual['fitness']
     
     def calculate_coverage_bonus(self, individual):
@@ -198,124 +245,57 @@ class GeneticAlgorithmOptimizer:
         
         return bonus
     
-    def selection(self, population):
-        
-        selected = []
-        tournament_size = 3
-        
-        for _ in range(len(population)):
-            tournament = random.sample(population, min(tournament_size, len(population)))
-            winner = max(tournament, key=lambda x: x['fitness'])
-            selected.append(winner.copy())
-        
-        return selected
-    
-    def crossover(self, parent1, parent2):
-        
-        if random.random() > self.crossover_rate:
-            return parent1.copy(), parent2.copy()
-        
-        child1 = {'towers': [], 'fitness': 0}
-        child2 = {'towers': [], 'fitness': 0}
-        
-        # Combinar torres dos pais
-        all_towers = parent1['towers'] + parent2['towers']
-        
-        # Remover duplicatas por posição
-        unique_positions = {}
-        for tower in all_towers:
-            pos = (tower['x'], tower['y'])
-            if pos not in unique_positions:
-                unique_positions[pos] = tower
-        
-        unique_towers = list(unique_positions.values())
-        
-        # Distribuir torres entre os filhos
-        for tower in unique_towers:
-            if len(child1['towers']) < 8 and random.random() < 0.5:
-                child1['towers'].append(tower.copy())
-            elif len(child2['towers']) < 8:
-                child2['towers'].append(tower.copy())
-        
-        return child1, child2
-    
-    def mutation(self, individual, game_map):
-        
-        mutated = individual.copy()
-        mutated['towers'] = [tower.copy() for tower in individual['towers']]
-        
-        # Mutação de tipo de torre
-        for tower in mutated['towers']:
-            if random.random() < self.mutation_rate:
-                tower['type'] = random.choice(['CANNON', 'MISSILE', 'LASER'])
-        
-        # Mutação de posição
-        for tower in mutated['towers']:
-            if random.random() < self.mutation_rate:
-                attempts = 0
-                while attempts < 20:
-                    new_x = random.randint(0, game_map.width - 1)
-                    new_y = random.randint(0, game_map.height - 1)
-                    
-                    if game_map.can_place_tower(new_x, new_y):
-                        tower['x'] = new_x
-                        tower['y'] = new_y
-                        break
-                    
-                    attempts += 1
-        
-        # Adicionar nova torre
-        if random.random() < self.mutation_rate and len(mutated['towers']) < 8:
-            attempts = 0
-            while attempts < 20:
-                x = random.randint(0, game_map.width - 1)
-                y = random.randint(0, game_map.height - 1)
-                
-                if game_map.can_place_tower(x, y):
-                    tower_type = random.choice(['CANNON', 'MISSILE', 'LASER'])
-                    mutated['towers'].append({
-                        'x': x,
-                        'y': y,
-                        'type': tower_type
-                    })
-                    break
-                
-                attempts += 1
-        
-        # Remover torre
-        if random.random() < self.mutation_rate and len(mutated['towers']) > 1:
-            mutated['towers'].pop(random.randint(0, len(mutated['towers']) - 1))
-        
-        return mutated
-    
     def evolve_generation(self, population, simulation_results, game_map):
         
         # Avaliar fitness
-        for individual in population:
-            self.evaluate_fitness(individual, simulation_results)
+        if self.evaluator is not None:
+            self.evaluate_with_rollouts(population, game_map)
+        else:
+            for individual in population:
+                self.evaluate_fitness(individual, simulation_results)
         
         # Registrar melhor fitness
-        best_fitness = max(individual['fitness'] for individual in population)
+        scores = np.array([individual['fitness'] for individual in population], dtype=float)
+        best_fitness = scores.max()
         self.best_fitness_history.append(best_fitness)
+        self.engine.record_best(best_fitness)
         
-        # Seleção
-        selected = self.selection(population)
-        
-        # Crossover e mutação
-        new_population = []
-        for i in range(0, len(selected), 2):
-            parent1 = selected[i]
-            parent2 = selected[(i + 1) % len(selected)]
-            
-            child1, child2 = self.crossover(parent1, parent2)
-            
-            child1 = self.mutation(child1, game_map)
-            child2 = self.mutation(child2, game_map)
-            
-            new_population.extend([child1, child2])
+        # Seleção, crossover e mutação sobre toda a população de uma vez
+        candidates = encode_cells(game_map.placement_cells(), game_map.width)
+        genomes, elite_scores = self.engine.next_generation(self.encode(population, game_map), scores, candidates)
+        fitness = list(elite_scores) + [0] * (len(genomes) - len(elite_scores))
         
         self.generation += 1
-        return new_population[:self.population_size]
+        return [self.decode(genome, game_map, f) for genome, f in zip(genomes, fitness)]
+
+    def evaluate_with_rollouts(self, population, game_map):
+        layouts = [individual['towers'] for individual in population]
+        chosen = list(range(len(population)))
+        if self.surrogate is not None:
+            from surrogate_model import layout_features
+            features = np.array([layout_features(layout, game_map) for layout in layouts])
+            cached = [self.evaluator.is_cached(layout) for layout in layouts]
+            best = max(self.best_fitness_history) if self.best_fitness_history else None
+            screened = self.surrogate.screen(features, best, always=[i for i, c in enumerate(cached) if c])
+            if screened is not None:
+                chosen = screened
+                mean, _ = self.surrogate.predict(features)
+                for i in set(range(len(population))) - set(chosen):
+                    population[i]['fitness'] = max(0, float(mean[i]))
+                    population[i]['estimated'] = True
+                self.surrogate.estimated += len(population) - len(chosen)
+
+        layout_results = self.evaluator.evaluate([layouts[i] for i in chosen])
+        for i, results in zip(chosen, layout_results):
+            fitness = self.evaluate_fitness(population[i], results)
+            population[i]['estimated'] = False
+            # Só rollouts novos ensinam o modelo (layouts do cache já foram vistos)
+            if self.surrogate is not None and not cached[i]:
+                self.surrogate.observe(features[i], fitness)
+                self.surrogate.evaluated += 1
+
+    def has_converged(self):
+        return self.engine.has_converged()
     
     def get_best_individual(self, population):
         
@@ -328,7 +308,9 @@ class GeneticAlgorithmOptimizer:
             'population_size': self.population_size,
             'mutation_rate': self.mutation_rate,
             'crossover_rate': self.crossover_rate,
-            'best_fitness_history': self.best_fitness_history
+            'best_fitness_history': self.best_fitness_history,
+            'converged': self.engine.has_converged(),
+            'surrogate': self.surrogate.get_stats() if self.surrogate is not None else None
         }
 
 class AIManager:
@@ -338,6 +320,20 @@ class AIManager:
         self.q_learning_agent = QLearningAgent()
         self.genetic_optimizer = GeneticAlgorithmOptimizer()
         self.tower_population = None
+
+    def enable_rollout_evaluation(self, game_map, rollouts=4, max_workers=None, **kwargs):
+        # Passa a testar cada layout com rollouts reais em vez de resultados compartilhados
+        from simulation import LayoutEvaluator
+        self.genetic_optimizer.evaluator = LayoutEvaluator(
+            game_map, self.q_learning_agent, rollouts=rollouts, max_workers=max_workers, **kwargs
+        )
+        return self.genetic_optimizer.evaluator
+
+    def enable_surrogate(self, **kwargs):
+        # Poda os rollouts com um modelo substituto treinado nos próprios rollouts
+        from surrogate_model import SurrogateModel
+        self.genetic_optimizer.surrogate = SurrogateModel(**kwargs)
+        return self.genetic_optimizer.surrogate
         
     def initialize_genetic_algorithm(self, game_map):
         
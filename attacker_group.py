@@ -0,0 +1,255 @@
+import numpy as np
+from map import CellType
+from agent import AttackerState
+from frame_timer import FrameTimer
+from event_log import events
+
+# Mesma ordem de direções usada em Attacker: Cima, Direita, Baixo, Esquerda
+DIRECTIONS = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+
+# Janela 5x5 do nível de perigo, na mesma ordem de soma de Attacker.get_state
+DANGER_OFFSETS = [(dx, dy) for dx in [-2, -1, 0, 1, 2] for dy in [-2, -1, 0, 1, 2]]
+
+class AttackerGroup:
+    """Passo em lote de todos os atacantes vivos.
+
+    Reúne os vetores de estado num array, escolhe as ações com uma única
+    consulta vetorizada à tabela Q (com máscara de epsilon) e calcula as
+    recompensas em bloco. A lógica por atacante (travamento, recuo tático,
+    movimento) continua a mesma de Attacker.update, mas o resultado não é
+    idêntico ao de chamar update() atacante por atacante:
+
+    - todas as ações do tick são escolhidas antes das atualizações Q de
+      recompensa do tick; no laço sequencial, a atualização de um atacante já
+      valia para a escolha dos atacantes seguintes na lista;
+    - a exploração sorteia com self.rng (NumPy) e não com o módulo random,
+      então a mesma semente gera outras escolhas.
+    """
+
+    def __init__(self, game_map, q_learning_agent, timer=None):
+        self.game_map = game_map
+        self.q_agent = q_learning_agent
+        self.timer = timer if timer is not None else FrameTimer()
+        # Gerador da exploração; o módulo np.random por padrão (simulações passam um próprio)
+        self.rng = np.random
+        self._grid_version = -1
+        self._tower_mask = None
+        self._passable_mask = None
+        self._danger_feature = None
+
+    def _refresh_masks(self):
+        # Máscaras de torres e de células transitáveis, com borda de 2 células
+        # para que os deslocamentos da janela 5x5 nunca saiam do array
+        if self._grid_version == self.game_map.version:
+            return
+        height, width = self.game_map.height, self.game_map.width
+        tower = np.zeros((height + 4, width + 4), dtype=bool)
+        passable = np.zeros((height + 4, width + 4), dtype=bool)
+        for y, row in enumerate(self.game_map.grid):
+            for x, cell in enumerate(row):
+                tower[y + 2, x + 2] = cell == CellType.TOWER
+                passable[y + 2, x + 2] = cell not in [CellType.OBSTACLE, CellType.TOWER]
+        self._tower_mask = tower
+        self._passable_mask = passable
+
+        # Nível de perigo de cada célula, somado na mesma ordem de get_state
+        danger = np.zeros((height, width))
+        for dx, dy in DANGER_OFFSETS:
+            is_tower = tower[2 + dy:2 + dy + height, 2 + dx:2 + dx + width]
+            danger = danger + np.where(is_tower, 1 / (abs(dx) + abs(dy) + 1), 0.0)
+        self._danger_feature = np.minimum((danger * 10).astype(np.int64), 10)
+        self._grid_version = self.game_map.version
+
+    def get_states(self, attackers):
+        # Versão vetorizada de Attacker.get_state para vários atacantes
+        xs = np.array([a.grid_x for a in attackers], dtype=np.int64)
+        ys = np.array([a.grid_y for a in attackers], dtype=np.int64)
+        features = []
+
+        if self.game_map.path_points:
+            path_dist = np.abs(ys - self.game_map.path_points[-1][1])
+            features.append(np.minimum(path_dist, 5))
+
+        features.append(self._danger_feature[ys, xs])
+
+        if self.game_map.end_pos:
+            end_x, end_y = self.game_map.end_pos
+            features.append(np.where(end_x > xs, 1, -1))
+            features.append(np.where(end_y > ys, 1, -1))
+
+        health = np.array([(a.health / a.max_health) * 10 for a in attackers])
+        features.append(health.astype(np.int64))
+
+        # tolist() garante ints do Python, para que a chave str(state) seja a mesma
+        columns = [column.tolist() for column in features]
+        return [tuple(row) for row in zip(*columns)]
+
+    def get_action_masks(self, attackers):
+        # Versão vetorizada de Attacker.get_possible_actions: (n, 4) booleano
+        xs = np.array([a.grid_x for a in attackers], dtype=np.int64)
+        ys = np.array([a.grid_y for a in attackers], dtype=np.int64)
+        valid = np.empty((len(attackers), len(DIRECTIONS)), dtype=bool)
+        for i, (dx, dy) in enumerate(DIRECTIONS):
+            valid[:, i] = self._passable_mask[ys + dy + 2, xs + dx + 2]
+        return valid
+
+    def choose_actions(self, states, valid):
+        # Mesma regra de QLearningAgent.choose_action, para todas as linhas de uma vez
+        n = len(states)
+        explore = self.rng.random(n) < self.q_agent.epsilon
+        actions = np.zeros(n, dtype=np.int64)
+
+        if explore.any():
+            counts = valid[explore].sum(axis=1)
+            picks = (self.rng.random(len(counts)) * counts).astype(np.int64)
+            # Índice da k-ésima ação válida de cada linha
+            cumulative = np.cumsum(valid[explore], axis=1)
+            actions[explore] = np.argmax(cumulative > picks[:, None], axis=1)
+
+        greedy_rows = np.flatnonzero(~explore)
+        if len(greedy_rows):
+            q_table = self.q_agent.q_table
+            q_values = np.full((len(greedy_rows), len(DIRECTIONS)), -np.inf)
+            valid_rows = valid.tolist()
+            for row, i in enumerate(greedy_rows):
+                state_q = q_table[self.q_agent.get_state_key(states[i])]
+                for action, ok in enumerate(valid_rows[i]):
+                    if ok:
+                        q_values[row, action] = state_q[action]
+
+            greedy_valid = valid[greedy_rows]
+            first_valid = np.argmax(greedy_valid, axis=1)
+            first_is_nan = np.isnan(q_values[np.arange(len(greedy_rows)), first_valid])
+            # Como no laço original, valores NaN nunca vencem a comparação
+            q_values = np.where(np.isnan(q_values) | ~greedy_valid, -np.inf, q_values)
+            best = q_values.max(axis=1)
+            candidates = greedy_valid & (q_values == best[:, None])
+            greedy_actions = np.argmax(candidates, axis=1)
+            actions[greedy_rows] = np.where(first_is_nan, first_valid, greedy_actions)
+
+        return actions.tolist()
+
+    def calculate_rewards(self, attackers):
+        # Versão vetorizada de Attacker.calculate_reward (mesma ordem das operações)
+        n = len(attackers)
+        xs = np.array([a.grid_x for a in attackers], dtype=np.int64)
+        ys = np.array([a.grid_y for a in attackers], dtype=np.int64)
+        stuck_time = np.array([a.stuck_time for a in attackers], dtype=float)
+        stuck_penalty = np.array([a.stuck_penalty for a in attackers], dtype=float)
+        reward = np.zeros(n)
+
+        reward = reward + np.where(stuck_time > 0, stuck_penalty * stuck_time, 0.0)
+        reward = reward - np.where(stuck_time > 1, 50, 0)
+
+        pos_count = np.array([a.last_positions.count((a.grid_x, a.grid_y)) for a in attackers])
+        reward = reward - np.where(pos_count > 1, 30 * (pos_count - 1), 0)
+
+        if self.game_map.end_pos:
+            end_x, end_y = self.game_map.end_pos
+            dist = np.abs(end_x - xs) + np.abs(end_y - ys)
+            last_distance = np.array([a.last_distance for a in attackers], dtype=float)
+            reward = reward + (last_distance - dist) * 2
+            for attacker, d in zip(attackers, dist.tolist()):
+                attacker.last_distance = d
+
+        adjacent_count = np.zeros(n, dtype=np.int64)
+        for dx, dy in [(0,1),(1,0),(0,-1),(-1,0)]:
+            is_tower = self._tower_mask[ys + dy + 2, xs + dx + 2]
+            reward = reward - np.where(is_tower, 15, 0)
+            adjacent_count += is_tower
+
+        adjacent_time = np.array([a.adjacent_tower_time for a in attackers], dtype=float)
+        adjacent_time = np.where(adjacent_count > 0, adjacent_time + 1/60, 0)
+        reward = reward - np.where(adjacent_time > 1, 40 * adjacent_time, 0.0)
+        for attacker, t in zip(attackers, adjacent_time.tolist()):
+            attacker.adjacent_tower_time = t
+
+        states = [a.state for a in attackers]
+        reward = reward + np.array([500 if s == AttackerState.REACHED_END else 0 for s in states])
+        reward = reward - np.array([200 if s == AttackerState.ELIMINATED else 0 for s in states])
+        return reward.tolist()
+
+    def step(self, attackers):
+        # Retorna o resultado de update() de cada atacante, na mesma ordem
+        results = [None] * len(attackers)
+        live = []
+        for i, attacker in enumerate(attackers):
+            if attacker.use_macro_actions or attacker.state in [AttackerState.ELIMINATED, AttackerState.REACHED_END]:
+                results[i] = attacker.update()
+            else:
+                live.append(i)
+        if not live:
+            return results
+
+        self._refresh_masks()
+        live_attackers = [attackers[i] for i in live]
+        states = self.get_states(live_attackers)
+        valid = self.get_action_masks(live_attackers)
+        # Ações válidas de cada atacante como listas, montadas uma única vez
+        possible = [[action for action, ok in enumerate(row) if ok] for row in valid.tolist()]
+
+        # Fase 1: travamento e recuo tático, por atacante
+        deciders = []
+        for k, (i, attacker) in enumerate(zip(live, live_attackers)):
+            current_pos = (attacker.grid_x, attacker.grid_y)
+            is_stuck = (current_pos == attacker.last_position) or (attacker.last_positions and current_pos in attacker.last_positions)
+            if is_stuck:
+                attacker.stuck_time += 1/60
+                penalty = attacker.stuck_penalty * (1 + attacker.stuck_time)
+                self.q_agent.update_q_value(states[k], attacker.last_action, penalty, states[k], possible[k])
+                if attacker.stuck_time > attacker.max_stuck_time:
+                    events.info('attacker_stuck', "Atacante eliminado por inatividade em {position}", position=current_pos)
+                    attacker.state = AttackerState.ELIMINATED
+                    results[i] = "eliminated"
+                    continue
+            else:
+                attacker.stuck_time = 0
+
+            attacker.last_position = current_pos
+            attacker.last_positions.append(current_pos)
+
+            tactical_action = attacker.tactical_retreat()
+            if tactical_action is not None:
+                attacker.execute_action(tactical_action)
+                results[i] = "retreating"
+                continue
+
+            if not possible[k]:
+                attacker.move_to_any_free_cell()
+                continue
+
+            deciders.append(k)
+
+        if not deciders:
+            return results
+
+        # Fase 2: escolha vetorizada das ações
+        decider_states = [states[k] for k in deciders]
+        decider_valid = valid[deciders]
+        actions = self.choose_actions(decider_states, decider_valid)
+
+        # Fase 3: recompensas em bloco e atualizações Q da experiência anterior
+        learners = [n for n, k in enumerate(deciders) if live_attackers[k].last_state is not None]
+        if learners:
+            with self.timer.span('q_update'):
+                rewards = self.calculate_rewards([live_attackers[deciders[n]] for n in learners])
+                for n, reward in zip(learners, rewards):
+                    attacker = live_attackers[deciders[n]]
+                    self.q_agent.update_q_value(attacker.last_state, attacker.last_action, reward, decider_states[n], possible[deciders[n]])
+
+        # Fase 4: execução das ações e novo estado de cada atacante
+        moved = [live_attackers[k] for k in deciders]
+        for attacker, action in zip(moved, actions):
+            attacker.execute_action(action)
+        new_states = self.get_states(moved)
+        for attacker, action, new_state in zip(moved, actions, new_states):
+            attacker.last_state = new_state
+            attacker.last_action = action
+
+            current_cell_type = self.game_map.get_cell(attacker.grid_x, attacker.grid_y)
+            if current_cell_type and current_cell_type.name == 'END':
+                attacker.state = AttackerState.REACHED_END
+            if attacker.health <= 0:
+                attacker.state = AttackerState.ELIMINATED
+
+        return results
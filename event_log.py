@@ -0,0 +1,191 @@
+import json
+import sys
+import threading
+import time
+from collections import deque
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'AVISO', ERROR: 'ERRO'}
+
+# Resumo de cada tipo de evento quando o limite por janela é atingido
+SUMMARIES = {
+    'attacker_spawned': "{count} atacantes gerados em {window:g}s",
+    'attacker_eliminated': "{count} atacantes eliminados em {window:g}s",
+    'attacker_reached_end': "{count} atacantes chegaram ao destino em {window:g}s",
+    'attacker_stuck': "{count} atacantes eliminados por inatividade em {window:g}s",
+    'ai_tower_placed': "{count} torres colocadas pela IA em {window:g}s"
+}
+
+class EventSink:
+    """Saída em buffer: quem registra só enfileira, uma thread escreve.
+
+    Os registros vão para um deque limitado (max_buffer; os mais antigos
+    são descartados se a escrita não der conta) e uma thread auxiliar os
+    escreve a cada flush_interval segundos, em texto ou JSON por linha.
+    stream=None usa o sys.stdout do momento da escrita.
+    """
+
+    def __init__(self, stream=None, fmt='text', flush_interval=0.2, max_buffer=10000):
+        if fmt not in ('text', 'json'):
+            raise ValueError(f"Formato desconhecido: {fmt}")
+        self.stream = stream
+        self.fmt = fmt
+        self.flush_interval = flush_interval
+        self.buffer = deque(maxlen=max_buffer)
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.thread = None
+        self.lock = threading.Lock()  # Só entre quem escreve (thread auxiliar e flush)
+
+    def put(self, record):
+        self.buffer.append(record)
+        if self.thread is None:
+            self.stopping = False
+            self.thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while not self.stopping:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            lines = []
+            while self.buffer:
+                lines.append(self.format(self.buffer.popleft()))
+            if not lines:
+                return
+            stream = self.stream if self.stream is not None else sys.stdout
+            try:
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+            except (OSError, ValueError):
+                pass  # Saída fechada: os eventos são descartados
+
+    def format(self, record):
+        wall_time, level, name, message, fields = record
+        if self.fmt == 'json':
+            data = {'time': wall_time, 'level': LEVEL_NAMES.get(level, level), 'event': name, 'message': message}
+            data.update(fields)
+            return json.dumps(data, default=str, ensure_ascii=False)
+        return message if level == INFO else f"{LEVEL_NAMES.get(level, level)}: {message}"
+
+    def close(self):
+        if self.thread is not None:
+            self.stopping = True
+            self.wakeup.set()
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+class EventLog:
+    """Eventos estruturados com nível, limite por tipo e agregação.
+
+    Cada chamada tem um tipo (ex.: 'attacker_eliminated'), uma mensagem com
+    campos nomeados ({x}, {y}) e os valores dos campos; a mensagem só é
+    formatada se o evento for emitido. Por janela de window segundos, cada
+    tipo emite no máximo rate_limit eventos; os demais só são contados e,
+    no fim da janela, viram uma linha de resumo (SUMMARIES). A escrita fica
+    com um EventSink em segundo plano.
+
+    Rollouts sem renderização registram dentro de `with events.muted():`,
+    que silencia apenas a thread atual.
+    """
+
+    def __init__(self, level=INFO, rate_limit=5, window=1.0, sink=None, enabled=True):
+        self.level = level
+        self.rate_limit = rate_limit  # None = sem limite
+        self.window = window
+        self.sink = sink if sink is not None else EventSink()
+        self.enabled = enabled
+        self.limits = {}
+        self.counters = {}  # tipo -> [início da janela, total, nível]
+        self.next_check = 0.0
+        self.local = threading.local()
+
+    def configure(self, name, rate_limit=None):
+        # Limite próprio de um tipo de evento (None = sem limite)
+        self.limits[name] = rate_limit
+
+    def log(self, name, message, level=INFO, **fields):
+        if not self.enabled or level < self.level or getattr(self.local, 'muted', False):
+            return
+        now = time.monotonic()
+        counter = self.counters.get(name)
+        if counter is None or now - counter[0] >= self.window:
+            if counter is not None:
+                self._summarize(name, counter)
+            counter = self.counters[name] = [now, 0, level]
+        counter[1] += 1
+        limit = self.limits.get(name, self.rate_limit)
+        if limit is None or counter[1] <= limit:
+            self.sink.put((time.time(), level, name, message.format(**fields) if fields else message, fields))
+
+    def debug(self, name, message, **fields):
+        if self.enabled and self.level <= DEBUG:
+            self.log(name, message, DEBUG, **fields)
+
+    def info(self, name, message, **fields):
+        if self.enabled and self.level <= INFO:
+            self.log(name, message, INFO, **fields)
+
+    def warning(self, name, message, **fields):
+        if self.enabled and self.level <= WARNING:
+            self.log(name, message, WARNING, **fields)
+
+    def error(self, name, message, **fields):
+        if self.enabled and self.level <= ERROR:
+            self.log(name, message, ERROR, **fields)
+
+    def _summarize(self, name, counter):
+        start, count, level = counter
+        shown = self.limits.get(name, self.rate_limit)
+        if shown is None or count <= shown:
+            return
+        template = SUMMARIES.get(name, "{count} eventos '{event}' em {window:g}s")
+        message = template.format(count=count, window=self.window, event=name) + f" ({shown} mostrados)"
+        self.sink.put((time.time(), level, name + '_summary', message, {'count': count, 'shown': shown}))
+
+    def tick(self, now=None):
+        # Fecha as janelas vencidas; chamado uma vez por atualização do jogo
+        now = time.monotonic() if now is None else now
+        if now < self.next_check:
+            return
+        self.next_check = now + self.window
+        self._expire(now)
+
+    def _expire(self, now):
+        for name, counter in list(self.counters.items()):
+            if now - counter[0] >= self.window:
+                self._summarize(name, counter)
+                del self.counters[name]
+
+    def muted(self):
+        return MutedEvents(self.local)
+
+    def flush(self):
+        self._expire(float('inf'))
+        self.sink.flush()
+
+    def close(self):
+        self._expire(float('inf'))
+        self.sink.close()
+
+class MutedEvents:
+    def __init__(self, local):
+        self.local = local
+        self.previous = False
+
+    def __enter__(self):
+        self.previous = getattr(self.local, 'muted', False)
+        self.local.muted = True
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.local.muted = self.previous
+        return False
+
+# Log compartilhado pelos módulos do jogo
+events = EventLog()
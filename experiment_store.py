@@ -0,0 +1,199 @@
+# Índice das partidas em SQLite, para comparar configurações entre muitas partidas:
+#   python experiment_store.py list --map-type complex --limit 20
+#   python experiment_store.py best epsilon_decay --metric defense_efficiency --map-type complex
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+# Colunas indexadas: identificação e hiperparâmetros da partida
+PARAM_COLUMNS = [
+    ('run_id', 'TEXT'),
+    ('seed', 'INTEGER'),  # Semente dos geradores da partida; sozinha não repete a partida
+    ('map_type', 'TEXT'),
+    ('player_mode', 'TEXT'),
+    ('placement_solver', 'TEXT'),
+    ('learning_rate', 'REAL'),
+    ('discount_factor', 'REAL'),
+    ('epsilon_decay', 'REAL'),
+    ('epsilon_min', 'REAL'),
+    ('population_size', 'INTEGER')
+]
+
+# Resultado final (Game.get_final_stats)
+STAT_COLUMNS = [
+    ('eliminated_attackers', 'INTEGER'),
+    ('successful_attackers', 'INTEGER'),
+    ('defense_efficiency', 'REAL'),
+    ('avg_survival_time', 'REAL'),
+    ('final_score', 'REAL'),
+    ('game_duration', 'REAL'),
+    ('towers', 'INTEGER')
+]
+
+INDEXED = ['run_id', 'seed', 'map_type', 'learning_rate', 'epsilon_decay', 'population_size']
+COLUMNS = ['recorded_at'] + [name for name, _ in PARAM_COLUMNS + STAT_COLUMNS] + ['extra']
+
+class ExperimentStore:
+    """Histórico de partidas (só inserções) num banco SQLite local.
+
+    Cada partida vira uma linha com os hiperparâmetros e as estatísticas
+    finais em colunas próprias; chaves desconhecidas vão em JSON na coluna
+    extra. As inserções ficam em memória e são gravadas em lote (uma
+    transação) a cada batch_size partidas, em flush() e em close().
+    Consultas usam índices nos hiperparâmetros mais comparados.
+    """
+
+    def __init__(self, path="experiments.db", batch_size=16):
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = []
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        columns = ", ".join(f"{name} {kind}" for name, kind in PARAM_COLUMNS + STAT_COLUMNS)
+        with self.connection:
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, recorded_at REAL, {columns}, extra TEXT)"
+            )
+            for name in INDEXED:
+                self.connection.execute(f"CREATE INDEX IF NOT EXISTS idx_runs_{name} ON runs ({name})")
+            # "Melhor valor de X neste tipo de mapa" filtra por map_type primeiro
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_runs_map_epsilon ON runs (map_type, epsilon_decay)"
+            )
+
+    def record(self, params, stats):
+        # params e stats: dicts; o que não tem coluna própria vai para extra
+        values = dict(params)
+        values.update(stats)
+        row = [time.time()]
+        for name, _ in PARAM_COLUMNS + STAT_COLUMNS:
+            row.append(values.pop(name, None))
+        row.append(json.dumps(values, default=str) if values else None)
+        self.pending.append(row)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT INTO runs ({', '.join(COLUMNS)}) VALUES ({placeholders})", self.pending
+            )
+        self.pending = []
+
+    def close(self):
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
+            self.connection = None
+
+    def _check_column(self, name):
+        # Nomes de coluna não podem ser parâmetros do SQL: só os conhecidos
+        if name not in COLUMNS and name != 'id':
+            raise ValueError(f"Coluna desconhecida: {name}")
+        return name
+
+    def _where(self, filters):
+        clauses, args = [], []
+        for name, value in filters.items():
+            if value is None:
+                continue
+            clauses.append(f"{self._check_column(name)} = ?")
+            args.append(value)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    def query(self, order_by='id', descending=False, limit=None, **filters):
+        # Partidas que batem com os filtros (coluna=valor), como dicts
+        self.flush()
+        where, args = self._where(filters)
+        sql = f"SELECT * FROM runs{where} ORDER BY {self._check_column(order_by)} {'DESC' if descending else 'ASC'}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        return [dict(row) for row in self.connection.execute(sql, args)]
+
+    def best_by(self, param, metric='defense_efficiency', limit=None, **filters):
+        # Média de metric para cada valor de param, do melhor para o pior
+        self.flush()
+        param = self._check_column(param)
+        metric = self._check_column(metric)
+        where, args = self._where(filters)
+        sql = (f"SELECT {param} AS value, AVG({metric}) AS mean, MIN({metric}) AS min, "
+               f"MAX({metric}) AS max, COUNT(*) AS runs FROM runs{where} "
+               f"GROUP BY {param} ORDER BY mean DESC")
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        return [dict(row) for row in self.connection.execute(sql, args)]
+
+    def count(self, **filters):
+        self.flush()
+        where, args = self._where(filters)
+        return self.connection.execute(f"SELECT COUNT(*) FROM runs{where}", args).fetchone()[0]
+
+def print_rows(rows, columns):
+    if not rows:
+        print("Nenhuma partida encontrada.")
+        return
+    widths = [max(len(c), *(len(format_value(row[c])) for row in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(format_value(row[c]).ljust(w) for c, w in zip(columns, widths)))
+
+def format_value(value):
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return "" if value is None else str(value)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta o histórico de partidas")
+    parser.add_argument("--db", default="experiments.db", help="banco SQLite")
+    parser.add_argument("--map-type", help="filtra pelo tipo de mapa (default/complex)")
+    parser.add_argument("--solver", help="filtra pelo posicionamento da IA (ga/greedy/mcts)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="lista as partidas")
+    list_parser.add_argument("--order-by", default="id")
+    list_parser.add_argument("--desc", action="store_true")
+    list_parser.add_argument("--limit", type=int, default=20)
+
+    best_parser = commands.add_parser("best", help="média de uma métrica por valor de um hiperparâmetro")
+    best_parser.add_argument("param", help="ex.: epsilon_decay, learning_rate, population_size")
+    best_parser.add_argument("--metric", default="defense_efficiency")
+    best_parser.add_argument("--limit", type=int)
+
+    commands.add_parser("count", help="número de partidas")
+
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        parser.error(f"banco não encontrado: {args.db}")
+    store = ExperimentStore(args.db)
+    filters = {'map_type': args.map_type, 'placement_solver': args.solver}
+    try:
+        if args.command == "list":
+            rows = store.query(order_by=args.order_by, descending=args.desc, limit=args.limit, **filters)
+            print_rows(rows, ['id', 'run_id', 'seed', 'map_type', 'placement_solver', 'learning_rate',
+                              'epsilon_decay', 'population_size', 'defense_efficiency', 'final_score'])
+        elif args.command == "best":
+            rows = store.best_by(args.param, args.metric, limit=args.limit, **filters)
+            print_rows(rows, ['value', 'mean', 'min', 'max', 'runs'])
+        else:
+            print(store.count(**filters))
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+import threading
+from collections import OrderedDict
+
+def canonical_layout(layout):
+    # Chave independente da ordem para layouts em qualquer um dos formatos:
+    # tuplas (x, y), dicts {'x', 'y', 'type'} ou objetos Tower
+    genes = []
+    for gene in layout:
+        if isinstance(gene, dict):
+            genes.append((gene['x'], gene['y'], gene.get('type')))
+        elif hasattr(gene, 'grid_x'):
+            # A fitness de tower.GeneticAlgorithm depende das estatísticas de
+            # combate de cada torre, então elas fazem parte da chave
+            genes.append((gene.grid_x, gene.grid_y, gene.tower_type['name'],
+                          gene.total_damage_dealt, gene.enemies_killed, gene.shots_fired))
+        else:
+            genes.append((gene[0], gene[1]))
+    return tuple(sorted(genes))
+
+def environment_fingerprint(game_map=None, attackers=None, extra=None):
+    # Versão do mapa + posições dos atacantes (sem ordem) + qualquer contexto extra
+    map_version = game_map.version if game_map is not None else None
+    attacker_snapshot = None
+    if attackers is not None:
+        positions = attackers.tolist() if hasattr(attackers, 'tolist') else [
+            (a.grid_x, a.grid_y) if hasattr(a, 'grid_x') else a for a in attackers
+        ]
+        attacker_snapshot = tuple(sorted(tuple(pos) for pos in positions))
+    if isinstance(extra, dict):
+        extra = tuple(sorted(extra.items()))
+    return (map_version, attacker_snapshot, extra)
+
+class FitnessCache:
+    """Cache LRU limitado de fitness, compartilhado pelos algoritmos genéticos.
+
+    A chave é (namespace, ambiente, layout canônico): o namespace separa as
+    funções de fitness de cada GA e o ambiente identifica o mapa e os atacantes
+    contra os quais o layout foi avaliado. É usado pela thread do jogo e pelas
+    de posicionamento ao mesmo tempo, por isso as operações tomam um lock.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def key(self, namespace, environment, layout):
+        return (namespace, environment, canonical_layout(layout))
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        # Consulta sem contar acerto/erro nem mexer na ordem LRU
+        with self.lock:
+            return key in self.entries
+
+    def reset_lock(self):
+        # Processo filho (fork) pode herdar o lock tomado por outra thread do pai
+        self.lock = threading.Lock()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0
+        }
+
+# Instância única usada por todos os algoritmos genéticos do jogo
+shared_fitness_cache = FitnessCache()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=shared_fitness_cache.reset_lock)
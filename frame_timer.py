@@ -0,0 +1,124 @@
+import json
+import os
+import time
+import numpy as np
+
+class Span:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if self.timer.enabled:
+            self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.start is not None:
+            self.timer.record(self.name, time.perf_counter_ns() - self.start)
+            self.start = None
+        return False
+
+class PhaseStats:
+    __slots__ = ('samples', 'index', 'count', 'total', 'max', 'buckets')
+
+    def __init__(self, window):
+        self.samples = np.zeros(window, dtype=np.int64)  # Últimas durações (ns)
+        self.index = 0
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * 64  # Histograma da sessão em potências de 2 de ns
+
+    def add(self, duration):
+        self.samples[self.index] = duration
+        self.index = (self.index + 1) % len(self.samples)
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        self.buckets[min(duration.bit_length(), 63)] += 1
+
+    def window(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+class FrameTimer:
+    """Tempo gasto em cada fase do quadro (atacantes, torres, IA, renderização...).
+
+    Cada fase é medida com `with timer.span("nome"):` usando perf_counter_ns.
+    As últimas `window` durações de cada fase ficam num buffer circular, de
+    onde saem p50/p99 para o HUD; a sessão inteira fica num histograma em
+    potências de 2, exportado em JSON por export(). Desligado, um span só
+    consulta timer.enabled.
+    """
+
+    def __init__(self, enabled=False, window=600, summary_interval=0.5):
+        self.enabled = enabled
+        self.window = window
+        self.summary_interval = summary_interval  # Segundos entre recálculos dos percentis
+        self.phases = {}
+        self.spans = {}
+        self._summary = []
+        self._summary_time = 0.0
+
+    def span(self, name):
+        span = self.spans.get(name)
+        if span is None:
+            span = self.spans[name] = Span(self, name)
+        return span
+
+    def record(self, name, duration):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = PhaseStats(self.window)
+        phase.add(duration)
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        return self.enabled
+
+    def reset(self):
+        self.phases.clear()
+        self._summary = []
+
+    def summary(self, force=False):
+        # [(fase, p50 ms, p99 ms, média ms)] da janela recente, recalculado no máximo a cada summary_interval
+        now = time.monotonic()
+        if force or now - self._summary_time >= self.summary_interval:
+            rows = []
+            for name, phase in self.phases.items():
+                samples = phase.window()
+                if not len(samples):
+                    continue
+                p50, p99 = np.percentile(samples, [50, 99]) / 1e6
+                rows.append((name, float(p50), float(p99), float(samples.mean()) / 1e6))
+            self._summary = rows
+            self._summary_time = now
+        return self._summary
+
+    def export(self, filename):
+        # Totais da sessão por fase; o histograma lista (limite superior em µs, contagem)
+        if not self.phases:
+            return None
+        windows = {name: (p50, p99, mean) for name, p50, p99, mean in self.summary(force=True)}
+        data = {}
+        for name, phase in self.phases.items():
+            p50, p99, _ = windows.get(name, (None, None, None))
+            data[name] = {
+                'count': phase.count,
+                'total_ms': phase.total / 1e6,
+                'mean_ms': phase.total / phase.count / 1e6,
+                'max_ms': phase.max / 1e6,
+                'recent_p50_ms': p50,
+                'recent_p99_ms': p99,
+                'histogram_us': [((1 << bit) / 1e3, count) for bit, count in enumerate(phase.buckets) if count]
+            }
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(filename, "w") as f:
+            json.dump({'exported_at': time.time(), 'phases': data}, f, indent=2)
+        return filename
@@ -0,0 +1,174 @@
+import numpy as np
+
+EMPTY = -1  # Gene sem torre (layouts de tamanho variável)
+
+def encode_cells(positions, width):
+    # (x, y) -> índice da célula no grid
+    return np.array([y * width + x for x, y in positions], dtype=np.int64)
+
+def decode_cell(cell, width):
+    return (int(cell) % width, int(cell) // width)
+
+class GenomeEngine:
+    """Algoritmo genético sobre genomas inteiros de largura fixa.
+
+    A população é um array (indivíduos, genes, 2) em que cada gene guarda
+    [índice da célula, tipo da torre]; células EMPTY marcam genes sem torre.
+    Seleção, crossover, mutação e reparo operam sobre a população inteira.
+    """
+
+    def __init__(self, num_genes, num_types=1, population_size=20, mutation_rate=0.1,
+                 crossover_rate=1.0, crossover_point=None, type_mutation_rate=0.0,
+                 resize_rate=0.0, min_genes=1, elite=0, tournament_size=3,
+                 patience=None, tolerance=1e-9, seed=None):
+        self.num_genes = num_genes
+        self.num_types = num_types
+        self.population_size = population_size
+        self.mutation_rate = mutation_rate
+        self.crossover_rate = crossover_rate
+        self.crossover_point = crossover_point  # None = crossover uniforme
+        self.type_mutation_rate = type_mutation_rate
+        self.resize_rate = resize_rate  # Chance de adicionar/remover uma torre
+        self.min_genes = min_genes
+        self.elite = elite
+        self.tournament_size = tournament_size
+
+        # Parada antecipada: sem melhora maior que tolerance por patience gerações
+        self.patience = patience
+        self.tolerance = tolerance
+        self.best_history = []
+
+        self.rng = np.random.default_rng(seed)
+
+    def random_population(self, candidates, size=None, min_genes=None, max_genes=None):
+        size = self.population_size if size is None else size
+        min_genes = self.min_genes if min_genes is None else min_genes
+        max_genes = self.num_genes if max_genes is None else max_genes
+        population = np.full((size, self.num_genes, 2), EMPTY, dtype=np.int64)
+        population[:, :, 1] = 0
+        if len(candidates) == 0 or size == 0:
+            return population
+
+        # Células distintas por indivíduo: permutação aleatória dos candidatos
+        take = min(self.num_genes, len(candidates))
+        order = np.argsort(self.rng.random((size, len(candidates))), axis=1)[:, :take]
+        lengths = self.rng.integers(min_genes, max_genes + 1, size)
+        present = np.arange(take)[None, :] < lengths[:, None]
+        population[:, :take, 0] = np.where(present, candidates[order], EMPTY)
+        population[:, :, 1] = self.rng.integers(0, self.num_types, (size, self.num_genes))
+        return population
+
+    def select(self, scores, count):
+        # Seleção por torneio para count pais de uma vez
+        contenders = self.rng.integers(0, len(scores), (count, self.tournament_size))
+        winners = np.argmax(scores[contenders], axis=1)
+        return contenders[np.arange(count), winners]
+
+    def crossover(self, parents_a, parents_b):
+        n = len(parents_a)
+        if self.crossover_point is None:
+            take_a = self.rng.random((n, self.num_genes)) < 0.5
+        else:
+            take_a = np.broadcast_to(np.arange(self.num_genes) < self.crossover_point, (n, self.num_genes))
+        children = np.where(take_a[:, :, None], parents_a, parents_b)
+        # Pares sem crossover copiam o primeiro pai
+        keep = self.rng.random(n) >= self.crossover_rate
+        children[keep] = parents_a[keep]
+        return children
+
+    def mutate(self, population, candidates):
+        population = population.copy()
+        cells = population[:, :, 0]
+        types = population[:, :, 1]
+        present = cells != EMPTY
+
+        if len(candidates):
+            move = present & (self.rng.random(cells.shape) < self.mutation_rate)
+            cells[move] = self.rng.choice(candidates, size=int(move.sum()))
+
+        retype = present & (self.rng.random(types.shape) < self.type_mutation_rate)
+        types[retype] = self.rng.integers(0, self.num_types, int(retype.sum()))
+
+        if self.resize_rate > 0 and len(candidates):
+            resize = np.flatnonzero(self.rng.random(len(population)) < self.resize_rate)
+            for row in resize.tolist():
+                filled = np.flatnonzero(cells[row] != EMPTY)
+                empty = np.flatnonzero(cells[row] == EMPTY)
+                if len(filled) > self.min_genes and (not len(empty) or self.rng.random() < 0.5):
+                    cells[row, self.rng.choice(filled)] = EMPTY
+                elif len(empty):
+                    slot = self.rng.choice(empty)
+                    cells[row, slot] = self.rng.choice(candidates)
+                    types[row, slot] = self.rng.integers(0, self.num_types)
+        return population
+
+    def repair(self, population, candidates, num_cells=None):
+        # Genes em células inválidas ou repetidas recebem uma célula candidata;
+        # genes vazios são preenchidos até min_genes
+        population = population.copy()
+        cells = population[:, :, 0]
+        if len(candidates) == 0:
+            cells[:] = EMPTY
+            return population
+
+        size = max(int(candidates.max()), int(cells.max())) + 1 if num_cells is None else num_cells
+        is_candidate = np.zeros(size, dtype=bool)
+        is_candidate[candidates] = True
+
+        for _ in range(3):
+            present = cells != EMPTY
+            invalid = present & ~is_candidate[np.where(present, cells, 0)]
+            duplicate = self._duplicates(cells)
+            missing = np.maximum(self.min_genes - (present & ~invalid & ~duplicate).sum(axis=1), 0)
+            refill = invalid | duplicate | (~present & (np.cumsum(~present, axis=1) <= missing[:, None]))
+            if not refill.any():
+                break
+            cells[refill] = self.rng.choice(candidates, size=int(refill.sum()))
+        else:
+            # Repetições que sobraram viram genes vazios
+            cells[self._duplicates(cells)] = EMPTY
+        return population
+
+    def _duplicates(self, cells):
+        # Marca a segunda ocorrência em diante de cada célula em cada linha
+        order = np.argsort(cells, axis=1, kind='stable')
+        sorted_cells = np.take_along_axis(cells, order, axis=1)
+        repeated = np.zeros_like(cells, dtype=bool)
+        repeated[:, 1:] = (sorted_cells[:, 1:] == sorted_cells[:, :-1]) & (sorted_cells[:, 1:] != EMPTY)
+        duplicate = np.zeros_like(repeated)
+        np.put_along_axis(duplicate, order, repeated, axis=1)
+        return duplicate
+
+    def next_generation(self, population, scores, candidates):
+        # Retorna (nova população, notas dos indivíduos de elite mantidos)
+        scores = np.asarray(scores, dtype=float)
+        ranked = np.argsort(-scores, kind='stable')
+        elite = ranked[:self.elite]
+        count = len(population) - len(elite)
+        parents_a = population[self.select(scores, count)]
+        parents_b = population[self.select(scores, count)]
+        children = self.mutate(self.crossover(parents_a, parents_b), candidates)
+        children = self.repair(children, candidates)
+        return np.concatenate([population[elite], children]), scores[elite]
+
+    def record_best(self, best):
+        self.best_history.append(best)
+
+    def has_converged(self):
+        if self.patience is None or len(self.best_history) <= self.patience:
+            return False
+        recent = self.best_history[-(self.patience + 1):]
+        return max(recent[1:]) - recent[0] <= self.tolerance
+
+    def evolve(self, population, fitness_fn, generations, candidates, scores=None):
+        # fitness_fn recebe um array de genomas e retorna as notas; a elite não é reavaliada
+        if scores is None:
+            scores = np.asarray(fitness_fn(population), dtype=float)
+        for _ in range(generations):
+            population, elite_scores = self.next_generation(population, scores, candidates)
+            child_scores = np.asarray(fitness_fn(population[len(elite_scores):]), dtype=float)
+            scores = np.concatenate([elite_scores, child_scores])
+            self.record_best(float(scores.max()) if len(scores) else 0.0)
+            if self.has_converged():
+                break
+        return population, scores
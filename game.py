@@ -1,12 +1,22 @@
 import pygame
+import os
 import random
 import time
+import numpy as np
 from enum import Enum
 from map import GameMap, CellType
-from agent import Attacker
-from tower import Tower, TowerType
+from agent import AttackerPool
+from tower import Tower, TowerType, TowerScheduler
 from ai import QLearningAgent
-from agent import Attacker, AttackerState
+from attacker_group import AttackerGroup
+from placement_worker import PlacementWorker
+from traffic_heatmap import TrafficHeatmap
+from mcts_planner import MCTSPlanner, plan_placement
+from island_ga import IslandModelOptimizer, evolve_islands
+from genetic_tower import attacker_positions
+from frame_timer import FrameTimer
+from memory_monitor import MemoryMonitor
+from event_log import events
 
 class PlayerMode(Enum):
     SPECTATOR = "Espectador"
@@ -16,7 +26,13 @@ class PlayerMode(Enum):
 class Game:
     def setup_data_logger(self):
         from game_data_logger import GameDataLogger
-        self.data_logger = GameDataLogger()
+        from metrics_writer import MetricsStreamWriter
+        # Cada partida grava suas métricas num diretório próprio em runs/
+        if hasattr(self, 'data_logger'):
+            self.data_logger.close(wait=False)
+        writer = MetricsStreamWriter()
+        self.data_logger = GameDataLogger(writer=writer)
+        print(f"Métricas da partida em {writer.run_dir}")
     def __init__(self, screen_width, screen_height, ui_instance):
         self.screen_width = screen_width
         self.screen_height = screen_height
@@ -33,6 +49,12 @@ class Game:
         # Listas de entidades
         self.attackers = []
         self.towers = []
+
+        # Torres agendadas pelo instante em que saem do cooldown, no relógio
+        # simulado: avança dt por atualização, parado na pausa e sem saltos
+        self.tower_scheduler = TowerScheduler()
+        self.dt = 1/60
+        self.sim_time = 0.0
         
         # Configurações do jogo
         self.player_mode = PlayerMode.SPECTATOR
@@ -40,6 +62,10 @@ class Game:
         self.current_tower_type_index = 0 # Índice para o tipo de torre atual
         self.tower_types_cycle = [TowerType.CANNON, TowerType.MISSILE, TowerType.LASER]
         self.max_towers = 4 # Limite máximo de torres
+
+        # Macro-ações dos atacantes (decisões só nas fronteiras das macros)
+        self.use_macro_actions = False
+        self.macro_action_length = 5 # Máximo de células por macro-ação
         
         # Estatísticas do jogo
         self.stats = {
@@ -59,6 +85,16 @@ class Game:
             epsilon_min=0.05
         )
 
+        # Tempo de cada fase do quadro (desligado por padrão; F3 no jogo)
+        self.timer = FrameTimer()
+
+        # Passo em lote dos atacantes (estado, ação e recompensa vetorizados)
+        self.batch_attacker_updates = True
+        self.attacker_group = AttackerGroup(self.game_map, self.q_learning_agent, timer=self.timer)
+
+        # Atacantes mortos são reciclados em vez de realocados
+        self.attacker_pool = AttackerPool(self.game_map, self.q_learning_agent)
+
         # Controle de tempo
         self.game_start_time = 0
         self.last_attacker_spawn = 0
@@ -75,16 +111,60 @@ class Game:
         # Configurações de IA
         self.ai_update_interval = 0.1  # segundos
         self.last_ai_update = 0
+
+        # Algoritmo genético de posicionamento persistente (ligado ao mapa atual)
+        self.tower_ga = None
+        self.ga_generations_per_update = 3
+        self.ga_population_size = 20
+
+        # Tráfego acumulado dos atacantes, usado como fitness do posicionamento
+        self.traffic_heatmap = TrafficHeatmap(self.game_map)
+        self.use_traffic_heatmap = True
+
+        # Posicionamento da IA: 'ga' (algoritmo genético em segundo plano),
+        # 'greedy' (cobertura máxima gulosa, determinística e rápida),
+        # 'mcts' (busca em árvore sobre simulações da partida atual) ou
+        # 'island' (algoritmo genético em ilhas, uma por processo)
+        self.placement_solver = 'ga'
+        self.tower_planner = None
+        self.island_optimizer = None
+
+        # Busca de posicionamento em segundo plano (thread ou processo)
+        self.placement_worker = PlacementWorker(use_processes=False)
+
+        # Tamanho das estruturas que crescem no treino, com orçamentos (MB)
+        self.memory_monitor = MemoryMonitor(self)
+
+        # Exportador de métricas para monitoramento (desligado por padrão)
+        self.metrics_exporter = None
+
+        # Semente das partidas (None sorteia uma por partida) e histórico em SQLite
+        self.seed = None
+        self.run_seed = None
+        self.rng = random.Random()
+        self.np_rng = np.random.default_rng()
+        self.map_type = None
+        self.experiment_store = None
+        self.experiment_db = "experiments.db"
     
     def start_new_game(self):
         """Inicia um novo jogo"""
         print("Iniciando novo jogo...")
         
         # Resetar estado
+        for attacker in self.attackers:
+            self.attacker_pool.release(attacker)
         self.attackers.clear()
         self.towers.clear()
+        self.tower_scheduler.clear()
+        self.sim_time = 0.0
+        self.tower_ga = None
+        self.placement_worker.discard()
+        self.traffic_heatmap.reset()
         self.game_over = False
         self.game_running = True
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.match_started()
         
         # Resetar estatísticas
         self.stats = {
@@ -101,11 +181,21 @@ class Game:
         self.last_attacker_spawn = self.game_start_time
         self.last_ai_update = self.game_start_time
         
+        # Geradores próprios da partida (mapa, spawns, exploração dos atacantes),
+        # sem mexer no estado global de random/np.random usado por GA e rollouts.
+        # Spawns e cooldowns seguem o relógio, então a semente não repete a partida
+        self.run_seed = self.seed if self.seed is not None else random.randrange(2 ** 31)
+        self.rng = random.Random(self.run_seed)
+        self.np_rng = np.random.default_rng(self.run_seed)
+        self.attacker_group.rng = self.np_rng
+
         # Gerar novo mapa (opcional)
-        if random.random() < 0.3:  # 30% de chance de mapa complexo
-            self.game_map.generate_complex_map()
+        if self.rng.random() < 0.3:  # 30% de chance de mapa complexo
+            self.game_map.generate_complex_map(self.rng)
+            self.map_type = 'complex'
         else:
-            self.game_map.generate_default_map()
+            self.game_map.generate_default_map(self.rng)
+            self.map_type = 'default'
         
         # Colocar algumas torres iniciais (modo espectador/defensor)
         # if self.player_mode != PlayerMode.ATTACKER:
@@ -117,22 +207,17 @@ class Game:
     
     def place_initial_towers(self):
         
-        initial_tower_count = random.randint(3, 6)
+        initial_tower_count = self.rng.randint(3, 6)
         towers_placed = 0
-        attempts = 0
-        max_attempts = 50
         
-        while towers_placed < initial_tower_count and attempts < max_attempts:
-            x = random.randint(0, self.map_width - 1)
-            y = random.randint(0, self.map_height - 1)
-            
-            if self.game_map.can_place_tower(x, y):
-                tower = Tower(x, y, self.game_map)
-                self.towers.append(tower)
-                self.game_map.place_tower(x, y)
-                towers_placed += 1
-            
-            attempts += 1
+        while towers_placed < initial_tower_count:
+            cell = self.game_map.random_placement_cell(rng=self.rng)
+            if cell is None:
+                break
+            # Tipo sorteado aqui, com o gerador da partida, e não dentro de Tower
+            tower = Tower(cell[0], cell[1], self.game_map, self.rng.choice(self.tower_types_cycle))
+            self.add_tower(tower)
+            towers_placed += 1
         
         self.stats['towers'] = len(self.towers)
         print(f"Torres iniciais colocadas: {towers_placed}")
@@ -142,18 +227,43 @@ class Game:
         max_attempts = 20
         for _ in range(max_attempts):
             spawn_x = 0
-            spawn_y = random.randint(0, self.map_height - 1)
+            spawn_y = self.rng.randint(0, self.map_height - 1)
             
             # Verifica se a célula é válida
             cell_type = self.game_map.get_cell(spawn_x, spawn_y)
             if cell_type in [CellType.PATH, CellType.START, CellType.EMPTY]:
-                attacker = Attacker(spawn_x, spawn_y, self.game_map, self.q_learning_agent)
+                attacker = self.attacker_pool.acquire(spawn_x, spawn_y,
+                                                      use_macro_actions=self.use_macro_actions,
+                                                      macro_length=self.macro_action_length)
+                attacker.slot_index = len(self.attackers)
                 self.attackers.append(attacker)
                 self.stats["active_attackers"] = len(self.attackers)
-                print(f"Atacante gerado em ({spawn_x}, {spawn_y})")
+                events.info('attacker_spawned', "Atacante gerado em ({x}, {y})", x=spawn_x, y=spawn_y)
                 return
         
-        print("Aviso: Não foi encontrar posição de spawn válida")
+        events.warning('spawn_failed', "Não foi encontrada posição de spawn válida")
+
+    def add_tower(self, tower):
+        self.towers.append(tower)
+        self.game_map.place_tower(tower.grid_x, tower.grid_y)
+        self.tower_scheduler.schedule(tower, tower.ready_time())
+        self.stats['towers'] = len(self.towers)
+
+    def remove_attacker(self, attacker):
+        # Remoção O(1): o último atacante da lista ocupa a vaga do removido
+        index = attacker.slot_index
+        if index is None:
+            return  # Já removido
+        last = self.attackers.pop()
+        if last is not attacker:
+            self.attackers[index] = last
+            last.slot_index = index
+        if attacker is self.player_controlled_attacker:
+            self.player_controlled_attacker = None
+        for tower in self.towers:
+            if tower.target is attacker:
+                tower.target = None
+        self.attacker_pool.release(attacker)
 
     def save_ai_data(self):
         print("Salvando dados da IA...")
@@ -166,68 +276,81 @@ class Game:
             return "idle"
     
         current_time = time.time()
+        self.sim_time += self.dt
+        timer = self.timer
 
-        
-        if hasattr(self, 'data_logger'):
-            stats = self.get_game_stats()
-            stats['time'] = current_time - self.game_start_time
-            self.data_logger.log(stats, stats['time'])
+        with timer.span('logging'):
+            if hasattr(self, 'data_logger'):
+                self.data_logger.log(self.stats, current_time - self.game_start_time)
     
         # Gerar atacantes periodicamente
         if current_time - self.last_attacker_spawn > self.attacker_spawn_interval:
-            self.spawn_attacker()
+            with timer.span('spawn'):
+                self.spawn_attacker()
             self.last_attacker_spawn = current_time
     
-        # Atualizar atacantes
+        # Atualizar atacantes (inclui as atualizações Q, medidas também em 'q_update')
         attackers_to_remove = []
-        for attacker in self.attackers:
-            result = attacker.update()
-    
+        with timer.span('attackers'):
+            if self.batch_attacker_updates:
+                results = self.attacker_group.step(self.attackers)
+            else:
+                results = [attacker.update() for attacker in self.attackers]
+        for attacker, result in zip(self.attackers, results):
             if result == "reached_end":
                 attackers_to_remove.append(attacker)
                 self.stats['successful_attackers'] += 1
                 self.stats['score'] -= 10
-                print("Atacante chegou ao destino!")
+                events.info('attacker_reached_end', "Atacante chegou ao destino!")
             elif result == "eliminated":
                 attackers_to_remove.append(attacker)
                 self.stats['eliminated_attackers'] += 1
                 self.stats['score'] += 5
-                print("Atacante eliminado!")
+                events.info('attacker_eliminated', "Atacante eliminado!")
     
         # Remover atacantes que terminaram
         for attacker in attackers_to_remove:
-            self.attackers.remove(attacker)
+            self.remove_attacker(attacker)
     
         self.stats['active_attackers'] = len(self.attackers)
+        with timer.span('heatmap'):
+            self.traffic_heatmap.record(self.attackers)
     
-        # Atualizar torres
-        for tower in self.towers:
-            target = tower.find_target(self.attackers)
-            if target:
-                damage_dealt = tower.attack(target)
-                if damage_dealt > 0:
-                    self.stats['score'] += 1
-                    # Verifica se o alvo morreu após o ataque
-                    if target.health <= 0:
-                        self.stats['eliminated_attackers'] += 1
-                        self.stats['score'] += 5
-                        self.attackers.remove(target)
-        
-        # Atualizar IA periodicamente
+        # Atualizar torres (apenas as que já saíram do cooldown)
+        with timer.span('towers'):
+            for tower in self.tower_scheduler.pop_ready(self.sim_time):
+                target = tower.find_target(self.attackers)
+                if target:
+                    damage_dealt = tower.attack(target, self.sim_time)
+                    if damage_dealt > 0:
+                        self.stats['score'] += 1
+                        # Verifica se o alvo morreu após o ataque
+                        if target.health <= 0:
+                            self.stats['eliminated_attackers'] += 1
+                            self.stats['score'] += 5
+                            self.remove_attacker(target)
+                self.tower_scheduler.schedule(tower, tower.ready_time())
+        
+        # Atualizar IA periodicamente (posicionamento de torres)
         if current_time - self.last_ai_update > self.ai_update_interval:
-            self.update_ai()
+            with timer.span('placement'):
+                self.update_ai()
             self.last_ai_update = current_time
 
         self.q_learning_agent.decay_epsilon() # Reduz o epsilon a cada frame
+        self.memory_monitor.check(current_time)
+        events.tick()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.tick(current_time)
         
         # Verificar condições de fim de jogo
         if self.check_game_over():
             self.game_over = True
             self.game_running = False
-            # Plota e salva resultados ao final da partida
+            # Fecha a gravação (o resto segue em segundo plano); gráficos: python report.py
             if hasattr(self, 'data_logger'):
-                self.data_logger.plot_results()
-                self.data_logger.save_csv()
+                self.data_logger.close(wait=False)
+            self.record_experiment()
             return "game_over"
         
         return "playing"
@@ -238,7 +361,8 @@ class Game:
             self.update_tower_ai()
     
     def update_tower_ai(self):
-        if len(self.towers) < 8 and random.random() < 0.1:  # 10% de chance por update
+        self.apply_ai_tower_placement()
+        if len(self.towers) < 8 and self.rng.random() < 0.1:  # 10% de chance por update
             self.try_place_ai_tower()
     
     def try_place_ai_tower(self):
@@ -246,15 +370,129 @@ class Game:
         from genetic_tower import TowerPlacementGA
         if len(self.towers) >= 4:
             return
-        ga = TowerPlacementGA(self.game_map, num_towers=4)
-        best_positions = ga.run(self.attackers)
-        for x, y in best_positions:
+        # Sem tráfego registrado ainda, avalia contra os atacantes atuais
+        heatmap = None
+        if self.use_traffic_heatmap and self.traffic_heatmap.total > 0:
+            heatmap = self.traffic_heatmap.snapshot()
+        if self.placement_solver == 'greedy':
+            self.place_greedy_towers(heatmap)
+            return
+        if self.placement_solver == 'mcts':
+            self.submit_mcts_placement()
+            return
+        if self.placement_solver == 'island':
+            self.submit_island_placement()
+            return
+        if self.tower_ga is None:
+            self.tower_ga = TowerPlacementGA(self.game_map, num_towers=4, population_size=self.ga_population_size)
+        if self.placement_worker.busy():
+            return
+        self.tower_ga.heatmap = heatmap
+        self.placement_worker.submit(self.tower_ga, self.game_map, self.attackers, self.ga_generations_per_update)
+
+    def place_greedy_towers(self, heatmap=None):
+        from greedy_placement import GreedyPlacementSolver
+        solver = GreedyPlacementSolver(self.game_map, tower_types=self.tower_types_cycle, heatmap=heatmap)
+        layout = solver.solve(self.attackers, existing=self.towers, num_towers=self.max_towers - len(self.towers))
+        self.place_ai_layout(layout, "cobertura gulosa")
+
+    def submit_mcts_placement(self):
+        if self.tower_planner is None:
+            self.tower_planner = MCTSPlanner()
+        if self.placement_worker.busy():
+            return
+        root = self.tower_planner.snapshot(self)
+        self.placement_worker.submit_task(
+            plan_placement, (self.tower_planner, root, self.max_towers - len(self.towers)), root.game_map.version
+        )
+
+    def submit_island_placement(self):
+        if self.placement_worker.busy():
+            return
+        snapshot = self.game_map.copy()
+        if self.island_optimizer is None:
+            # Épocas curtas: uma busca por atualização da IA, como a GA em segundo plano.
+            # spawn: os processos são criados fora da thread principal de um processo com pygame
+            self.island_optimizer = IslandModelOptimizer(
+                snapshot, num_towers=4, num_islands=4, population_size=self.ga_population_size,
+                epochs=2, migration_interval=self.ga_generations_per_update, timeout=30.0, start_method="spawn"
+            )
+        self.island_optimizer.game_map = snapshot
+        self.placement_worker.submit_task(
+            evolve_islands, (self.island_optimizer, attacker_positions(self.attackers)), snapshot.version
+        )
+
+    def apply_ai_tower_placement(self):
+        result = self.placement_worker.poll()
+        if result is None:
+            return
+        searcher, best, map_version = result
+        if isinstance(searcher, MCTSPlanner):
+            self.tower_planner = searcher
+            layout, method = best, "busca em árvore (MCTS)"
+        elif isinstance(searcher, IslandModelOptimizer):
+            self.island_optimizer = searcher
+            layout, method = [(x, y, None) for x, y in best], "algoritmo genético em ilhas"
+        else:
+            self.tower_ga = searcher
+            layout, method = [(x, y, None) for x, y in best], "algoritmo genético"
+        if map_version != self.game_map.version:
+            return  # Resultado obsoleto: o mapa mudou enquanto a IA pensava
+        self.place_ai_layout(layout, method)
+
+    def place_ai_layout(self, layout, method):
+        # layout: [(x, y, tipo)]; tipo None sorteia o tipo da torre
+        for x, y, tower_type in layout:
             if self.game_map.can_place_tower(x, y) and len(self.towers) < 4:
-                tower = Tower(x, y, self.game_map)
-                self.towers.append(tower)
-                self.game_map.place_tower(x, y)
-                self.stats['towers'] = len(self.towers)
-                print(f"IA colocou torre em ({x}, {y}) usando algoritmo genético")
+                tower = Tower(x, y, self.game_map, tower_type)
+                self.add_tower(tower)
+                events.info('ai_tower_placed', "IA colocou torre em ({x}, {y}) usando {method}", x=x, y=y, method=method)
+
+    def record_experiment(self):
+        # Uma linha por partida encerrada; consultas: python experiment_store.py
+        from experiment_store import ExperimentStore
+        if self.experiment_store is None:
+            self.experiment_store = ExperimentStore(self.experiment_db)
+        agent = self.q_learning_agent
+        params = {
+            'run_id': self.data_logger.writer.manifest['run'] if hasattr(self, 'data_logger') else None,
+            'seed': self.run_seed,
+            'map_type': self.map_type,
+            'player_mode': self.player_mode.value,
+            'placement_solver': self.placement_solver,
+            'learning_rate': agent.learning_rate,
+            'discount_factor': agent.discount_factor,
+            'epsilon_decay': agent.epsilon_decay,
+            'epsilon_min': agent.epsilon_min,
+            'population_size': self.ga_population_size,
+            'final_epsilon': agent.epsilon
+        }
+        stats = self.get_final_stats()
+        stats['game_duration'] = time.time() - self.game_start_time
+        stats['towers'] = len(self.towers)
+        self.experiment_store.record(params, stats)
+
+    def enable_metrics_exporter(self, port=9464, file_path=None, host="127.0.0.1"):
+        # port=None desliga o HTTP; file_path grava o mesmo texto num arquivo
+        from metrics_exporter import MetricsExporter
+        if self.metrics_exporter is None:
+            self.metrics_exporter = MetricsExporter(self, host=host, port=port, file_path=file_path).start()
+        return self.metrics_exporter
+
+    def close(self):
+        self.placement_worker.close()
+        if hasattr(self, 'data_logger'):
+            self.data_logger.close()
+        if self.tower_planner is not None:
+            self.tower_planner.close()
+        if self.experiment_store is not None:
+            self.experiment_store.close()
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.close()
+        events.close()
+        if self.timer.phases:
+            path = self.timer.export(os.path.join("runs", time.strftime("timings-%Y%m%d-%H%M%S.json")))
+            print(f"Tempos por fase salvos em {path}")
     
     def check_game_over(self):
         
@@ -279,9 +517,7 @@ class Game:
             if len(self.towers) < self.max_towers and self.game_map.can_place_tower(grid_x, grid_y):
                 current_type = self.tower_types_cycle[self.current_tower_type_index]
                 tower = Tower(grid_x, grid_y, self.game_map, tower_type=current_type)
-                self.towers.append(tower)
-                self.game_map.place_tower(grid_x, grid_y)
-                self.stats["towers"] = len(self.towers)
+                self.add_tower(tower)
                 print(f"Torre {current_type["name"]} colocada em ({grid_x}, {grid_y})")
                 
                 # Ciclar para o próximo tipo de torre
@@ -293,6 +529,7 @@ class Game:
                 for tower in self.towers[:]:
                     if tower.grid_x == grid_x and tower.grid_y == grid_y:
                         self.towers.remove(tower)
+                        self.tower_scheduler.remove(tower)
                         break
                 
                 self.game_map.remove_tower(grid_x, grid_y)
@@ -350,7 +587,12 @@ class Game:
     def render(self, screen):
         
         # Renderizar mapa
-        self.game_map.render(screen)
+        with self.timer.span('render_map'):
+            self.game_map.render(screen)
+        with self.timer.span('render_entities'):
+            self.render_entities(screen)
+
+    def render_entities(self, screen):
         
         # Renderizar atacantes
         for attacker in self.attackers:
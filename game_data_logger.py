@@ -1,52 +1,152 @@
-import matplotlib.pyplot as plt
+import numpy as np
 
 class GameDataLogger:
+    """Histórico das métricas do jogo em colunas NumPy pré-alocadas.
+
+    Cada métrica é um array (float64 para números; códigos int32 para textos,
+    como o modo do jogador). Sem max_rows os arrays crescem em blocos de
+    chunk_size linhas; com max_rows viram um buffer circular que sobrescreve as
+    linhas mais antigas, e a memória fica constante. sample_interval descarta
+    amostras mais próximas que esse intervalo (em segundos de jogo) e
+    record_changes_only descarta quadros em que nenhuma métrica mudou.
+
+    Com um writer (metrics_writer.MetricsStreamWriter), cada linha registrada
+    também segue para a gravação em disco em segundo plano. Os gráficos são
+    gerados depois, a partir dos arquivos gravados, por report.py.
+    """
+
     def save_csv(self, filename="game_stats.csv"):
         import csv
-        if not self.stats_history:
+        if not self.size:
             print("Nenhum dado para salvar.")
             return
-        keys = list(self.stats_history[0].keys())
+        keys = self.keys()
+        columns = [self.column(key, decode=True) for key in keys]
         with open(filename, mode="w", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=keys)
-            writer.writeheader()
-            writer.writerows(self.stats_history)
+            writer = csv.writer(f)
+            writer.writerow(keys)
+            writer.writerows(zip(*columns))
         print(f"Dados salvos em {filename}")
-    def __init__(self):
-        self.stats_history = []
+
+    def __init__(self, chunk_size=4096, max_rows=None, sample_interval=0.0, record_changes_only=False, writer=None):
+        self.chunk_size = chunk_size
+        self.max_rows = max_rows
+        self.sample_interval = sample_interval
+        self.record_changes_only = record_changes_only
+
+        self.columns = {'time': np.empty(0)}
+        self.categories = {}  # coluna de texto -> lista de valores (código = índice)
+        self.category_codes = {}  # coluna de texto -> {valor: código}
+        self.capacity = 0
+        self.size = 0
+        self.start = 0  # Linha mais antiga quando o buffer circular está cheio
+        self.last_time = None
+        self.last_values = None
+        self.writer = writer
+
+    def __len__(self):
+        return self.size
+
+    def _add_column(self, name, value):
+        # Colunas que aparecem depois ficam NaN (ou -1) nas linhas anteriores
+        if isinstance(value, (bool, int, float, np.number)):
+            self.columns[name] = np.full(self.capacity, np.nan)
+        else:
+            self.columns[name] = np.full(self.capacity, -1, dtype=np.int32)
+            self.categories[name] = []
+            self.category_codes[name] = {}
+
+    def _encode(self, name, value):
+        codes = self.category_codes.get(name)
+        if codes is None:
+            return value
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.categories[name])
+            self.categories[name].append(value)
+        return code
+
+    def _grow(self):
+        # Só cresce antes de o buffer circular dar a volta, então start == 0
+        capacity = self.capacity + self.chunk_size
+        if self.max_rows is not None:
+            capacity = min(capacity, self.max_rows)
+        for name, array in self.columns.items():
+            grown = np.full(capacity, -1 if array.dtype == np.int32 else np.nan, dtype=array.dtype)
+            grown[:self.size] = array[:self.size]
+            self.columns[name] = grown
+        self.capacity = capacity
 
     def log(self, stats, game_time):
-        # stats: dict com métricas do jogo
-        entry = stats.copy()
-        entry['time'] = game_time
-        self.stats_history.append(entry)
-
-    def plot_results(self):
-        if not self.stats_history:
-            print("Nenhum dado para plotar.")
+        # stats: dict com métricas do jogo (não é guardado nem copiado)
+        if self.sample_interval and self.last_time is not None and game_time - self.last_time < self.sample_interval:
             return
-        times = [s['time'] for s in self.stats_history]
-        eliminated = [s['eliminated_attackers'] for s in self.stats_history]
-        successful = [s['successful_attackers'] for s in self.stats_history]
-        score = [s['score'] for s in self.stats_history]
-        towers = [s['towers'] for s in self.stats_history]
-        plt.figure(figsize=(12, 6))
-        plt.subplot(2, 2, 1)
-        plt.plot(times, eliminated, label="Eliminados")
-        plt.plot(times, successful, label="Bem-sucedidos")
-        plt.xlabel("Tempo (s)")
-        plt.ylabel("Atacantes")
-        plt.legend()
-        plt.title("Atacantes Eliminados vs Bem-sucedidos")
-        plt.subplot(2, 2, 2)
-        plt.plot(times, score, color='purple')
-        plt.xlabel("Tempo (s)")
-        plt.ylabel("Pontuação")
-        plt.title("Pontuação ao Longo do Tempo")
-        plt.subplot(2, 2, 3)
-        plt.plot(times, towers, color='orange')
-        plt.xlabel("Tempo (s)")
-        plt.ylabel("Torres")
-        plt.title("Torres Colocadas")
-        plt.tight_layout()
-        plt.show()
+        if self.record_changes_only:
+            values = tuple(stats.items())
+            if values == self.last_values:
+                return
+            self.last_values = values
+
+        if self.size == self.capacity and (self.max_rows is None or self.capacity < self.max_rows):
+            self._grow()
+        if self.size < self.capacity:
+            index = self.size
+            self.size += 1
+        else:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+
+        self.columns['time'][index] = game_time
+        for name, value in stats.items():
+            if name not in self.columns:
+                self._add_column(name, value)
+            self.columns[name][index] = self._encode(name, value)
+        self.last_time = game_time
+
+        if self.writer is not None:
+            self.writer.write(game_time, tuple(stats.items()))
+
+    def trim(self, max_rows):
+        # Mantém só as max_rows linhas mais recentes e passa a usar buffer circular
+        keep = min(self.size, max_rows)
+        for name in list(self.columns.keys()):
+            values = self.column(name)[self.size - keep:]
+            array = np.full(max_rows, -1 if values.dtype == np.int32 else np.nan, dtype=values.dtype)
+            array[:keep] = values
+            self.columns[name] = array
+        self.capacity = self.max_rows = max_rows
+        self.size = keep
+        self.start = 0
+
+    def close(self, wait=True):
+        # Encerra a gravação em segundo plano (se houver)
+        if self.writer is not None:
+            self.writer.close(wait)
+
+    def keys(self):
+        # Mesma ordem das linhas antigas (stats.copy() + 'time'): o tempo vem por último
+        return [key for key in self.columns if key != 'time'] + ['time']
+
+    def column(self, name, decode=False):
+        # Valores da coluna em ordem cronológica
+        array = self.columns[name]
+        if self.start:
+            values = np.concatenate((array[self.start:self.size], array[:self.start]))
+        else:
+            values = array[:self.size]
+        if not decode:
+            return values
+        # decode=True devolve listas com os valores originais (textos e inteiros)
+        if name in self.categories:
+            labels = self.categories[name]
+            return [labels[code] if code >= 0 else None for code in values.tolist()]
+        if np.all(np.isfinite(values)) and np.all(values == np.round(values)):
+            return values.astype(np.int64).tolist()
+        return values.tolist()
+
+    @property
+    def stats_history(self):
+        # Compatibilidade: linhas como dicts, montadas só quando pedidas
+        keys = self.keys()
+        columns = [self.column(key, decode=True) for key in keys]
+        return [dict(zip(keys, row)) for row in zip(*columns)]
@@ -1,61 +1,136 @@
-import random
+import numpy as np
+from fitness_cache import shared_fitness_cache, environment_fingerprint
+from ga_engine import GenomeEngine, EMPTY, encode_cells, decode_cell
+
+def attacker_positions(attackers):
+    # Aceita objetos Attacker ou tuplas (x, y); retorna array (atacantes, 2)
+    positions = [(a.grid_x, a.grid_y) if hasattr(a, 'grid_x') else tuple(a) for a in attackers]
+    return np.array(positions, dtype=np.int64).reshape(-1, 2)
 
 class TowerPlacementGA:
-    def __init__(self, game_map, num_towers=4, population_size=20, generations=10, mutation_rate=0.1):
+    # Adaptador de GenomeEngine: genomas com num_towers células, fitness = cobertura
+    def __init__(self, game_map, num_towers=4, population_size=20, generations=10, mutation_rate=0.1,
+                 crossover_point=None, patience=None, heatmap=None, coverage_radius=2, uniform_crossover=False):
         self.game_map = game_map
         self.num_towers = num_towers
         self.population_size = population_size
         self.generations = generations
         self.mutation_rate = mutation_rate
+        # Quantos genes vêm do primeiro pai no crossover (None = uniforme, gene a gene)
+        if uniform_crossover:
+            self.crossover_point = None
+        else:
+            self.crossover_point = crossover_point if crossover_point is not None else num_towers // 2
+
+        # Com um TrafficHeatmap, a fitness é o tráfego acumulado ao alcance das
+        # torres em vez da cobertura dos atacantes do quadro atual
+        self.heatmap = heatmap
+        self.coverage_radius = coverage_radius
+
+        # Metade melhor sobrevive; a outra metade vem de crossover + mutação
+        self.engine = GenomeEngine(
+            num_genes=num_towers, population_size=population_size, mutation_rate=mutation_rate,
+            crossover_point=self.crossover_point, min_genes=num_towers,
+            elite=population_size // 2, patience=patience
+        )
+
+        # População persistente entre chamadas de evolve (busca com partida a quente)
+        self.population = None
+        self.map_version = None
+        self.map_size = (game_map.width, game_map.height)
+
+    def candidate_cells(self):
+        return encode_cells(self.game_map.placement_cells(avoid_endpoints=True), self.game_map.width)
+
+    def decode(self, genome):
+        return [decode_cell(cell, self.game_map.width) for cell in genome[:, 0] if cell != EMPTY]
+
+    def encode(self, population):
+        genomes = np.full((len(population), self.num_towers, 2), EMPTY, dtype=np.int64)
+        genomes[:, :, 1] = 0
+        for i, individual in enumerate(population):
+            cells = encode_cells(individual[:self.num_towers], self.game_map.width)
+            genomes[i, :len(cells), 0] = cells
+        return genomes
 
-    def random_individual(self):
-        positions = []
-        attempts = 0
-        while len(positions) < self.num_towers and attempts < 100:
-            x = random.randint(0, self.game_map.width - 1)
-            y = random.randint(0, self.game_map.height - 1)
-            if self.game_map.can_place_tower(x, y):
-                start = self.game_map.start_pos
-                end = self.game_map.end_pos
-                too_close_to_start = start and (abs(x - start[0]) + abs(y - start[1]) < 4)
-                too_close_to_end = end and (abs(x - end[0]) + abs(y - end[1]) < 4)
-                if not too_close_to_start and not too_close_to_end and (x, y) not in positions:
-                    positions.append((x, y))
-            attempts += 1
-        return positions
+    def genome_fitness(self, genomes, positions):
+        # Cobertura de toda a população num único broadcast:
+        # (população, torres, 1, 2) contra (1, 1, atacantes, 2)
+        if self.heatmap is not None:
+            return self.heatmap.score_genomes(genomes[:, :, 0], self.coverage_radius)
+        if len(genomes) == 0 or len(positions) == 0:
+            return np.zeros(len(genomes), dtype=np.int64)
+        cells = genomes[:, :, 0]
+        valid = cells != EMPTY
+        towers = np.stack([cells % self.game_map.width, cells // self.game_map.width], axis=2)
+        dist = np.abs(towers[:, :, None, :] - positions[None, None, :, :]).sum(axis=3)
+        covered = ((dist <= self.coverage_radius) & valid[:, :, None]).any(axis=1)
+        return covered.sum(axis=1)
+
+    def population_fitness(self, population, attackers):
+        if not isinstance(attackers, np.ndarray):
+            attackers = attacker_positions(attackers)
+        if not isinstance(population, np.ndarray):
+            population = self.encode(population)
+        return self.genome_fitness(population, attackers)
+
+    def cached_population_fitness(self, genomes, positions):
+        # Consulta o cache compartilhado e calcula só os layouts ainda não vistos,
+        # todos de uma vez
+        if self.heatmap is not None:
+            environment = environment_fingerprint(self.game_map, extra=('traffic', self.heatmap.revision, self.coverage_radius))
+        else:
+            environment = environment_fingerprint(self.game_map, positions)
+        keys = [shared_fitness_cache.key('coverage', environment, self.decode(genome)) for genome in genomes]
+        scores = [shared_fitness_cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            computed = self.genome_fitness(genomes[missing], positions).tolist()
+            for i, score in zip(missing, computed):
+                scores[i] = score
+                shared_fitness_cache.put(keys[i], score)
+        return scores
 
     def fitness(self, individual, attackers):
-        covered = set()
-        for tower_x, tower_y in individual:
-            for attacker in attackers:
-                dist = abs(attacker.grid_x - tower_x) + abs(attacker.grid_y - tower_y)
-                if dist <= 2:
-                    covered.add(attacker)
-        return len(covered)
-
-    def crossover(self, parent1, parent2):
-        split = self.num_towers // 2
-        child = parent1[:split] + [pos for pos in parent2 if pos not in parent1][:self.num_towers - split]
-        return child
-
-    def mutate(self, individual):
-        if random.random() < self.mutation_rate:
-            idx = random.randint(0, self.num_towers - 1)
-            new_pos = self.random_individual()[0]
-            individual[idx] = new_pos
-        return individual
+        return self.population_fitness([individual], attackers)[0].item()
+
+    def repair_population(self):
+        # Mantém os genes ainda válidos e substitui apenas os invalidados
+        self.population = self.engine.repair(self.population, self.candidate_cells(),
+                                             self.game_map.width * self.game_map.height)
+
+    def sync_map(self):
+        # Reaproveita a população se o mapa mudou; reinicia só se mudou de tamanho
+        size = (self.game_map.width, self.game_map.height)
+        if size != self.map_size:
+            self.population = None
+            self.map_size = size
+        elif self.population is not None and self.map_version != self.game_map.version:
+            self.repair_population()
+        self.map_version = self.game_map.version
+
+    def evolve(self, attackers, generations=None):
+        # Continua a busca a partir da população anterior, contra os atacantes atuais
+        if generations is None:
+            generations = self.generations
+        self.sync_map()
+        if self.population is None:
+            self.population = self.engine.random_population(self.candidate_cells())
+        self.population, best = self._evolve_population(self.population, attackers, generations)
+        return best
 
     def run(self, attackers):
-        population = [self.random_individual() for _ in range(self.population_size)]
-        for gen in range(self.generations):
-            scored = [(self.fitness(ind, attackers), ind) for ind in population]
-            scored.sort(reverse=True, key=lambda x: x[0])
-            next_gen = [ind for _, ind in scored[:self.population_size // 2]]
-            while len(next_gen) < self.population_size:
-                parents = random.sample(next_gen, 2)
-                child = self.crossover(parents[0], parents[1])
-                child = self.mutate(child)
-                next_gen.append(child)
-            population = next_gen
-        best = max(population, key=lambda ind: self.fitness(ind, attackers))
+        population = self.engine.random_population(self.candidate_cells())
+        _, best = self._evolve_population(population, attackers, self.generations)
         return best
+
+    def _evolve_population(self, population, attackers, generations):
+        positions = attacker_positions(attackers)
+        population, scores = self.engine.evolve(
+            population,
+            lambda genomes: self.cached_population_fitness(genomes, positions),
+            generations,
+            self.candidate_cells()
+        )
+        best = self.decode(population[int(np.argmax(scores))])
+        return population, best
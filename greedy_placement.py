@@ -0,0 +1,119 @@
+import heapq
+import numpy as np
+from ga_engine import encode_cells
+from genetic_tower import attacker_positions
+
+class GreedyPlacementSolver:
+    """Posicionamento de torres por cobertura máxima com guloso preguiçoso.
+
+    Os alvos são as células com atacantes (ou com tráfego, se houver um
+    TrafficHeatmap), com peso igual ao número de atacantes ou ao calor. Cada
+    candidato cobre os alvos ao seu alcance; a cada passo entra o candidato que
+    cobre mais peso ainda não coberto. Como a cobertura é submodular, o ganho de
+    um candidato só diminui: ele fica numa fila de prioridade e só é recalculado
+    quando chega ao topo. O resultado é determinístico e tem garantia de
+    aproximação (1 - 1/e) do ótimo.
+    """
+
+    def __init__(self, game_map, num_towers=4, coverage_radius=2, tower_types=None, heatmap=None):
+        self.game_map = game_map
+        self.num_towers = num_towers
+        # Sem tipos: alcance Manhattan coverage_radius, igual ao TowerPlacementGA.
+        # Com tipos: cada (célula, tipo) é um candidato com o alcance euclidiano do tipo
+        self.coverage_radius = coverage_radius
+        self.tower_types = tower_types
+        self.heatmap = heatmap
+
+    def targets(self, attackers):
+        # Retorna (posições (n, 2), pesos (n,)) dos alvos a cobrir
+        if self.heatmap is not None:
+            heat = self.heatmap.heat
+            ys, xs = np.nonzero(heat > 0)
+            return np.stack([xs, ys], axis=1), heat[ys, xs]
+        positions = attacker_positions(attackers)
+        if len(positions) == 0:
+            return positions, np.zeros(0)
+        cells, weights = np.unique(positions, axis=0, return_counts=True)
+        return cells, weights.astype(float)
+
+    def candidates(self):
+        # Células válidas em ordem fixa, para que o desempate seja reprodutível
+        cells = np.sort(encode_cells(self.game_map.placement_cells(avoid_endpoints=True), self.game_map.width))
+        return np.stack([cells % self.game_map.width, cells // self.game_map.width], axis=1)
+
+    def covers(self, cells, targets, tower_range=None):
+        # Matriz (células, alvos) booleana. Candidatos e torres existentes usam a
+        # mesma métrica: Manhattan até coverage_radius sem tipos, euclidiana até
+        # tower_range com tipos
+        delta = np.abs(cells[:, None, :] - targets[None, :, :])
+        if self.tower_types is None:
+            return delta.sum(axis=2) <= self.coverage_radius
+        return (delta ** 2).sum(axis=2) <= tower_range ** 2
+
+    def coverage_sets(self, cells, targets):
+        # Matriz (candidatos, alvos) booleana, mais o tipo e o custo de cada candidato
+        if self.tower_types is None:
+            cover = self.covers(cells, targets)
+            return cover, np.arange(len(cells)), [None] * len(cells), np.zeros(len(cells))
+        covers, owners, types, costs = [], [], [], []
+        for tower_type in self.tower_types:
+            covers.append(self.covers(cells, targets, tower_type['range']))
+            owners.append(np.arange(len(cells)))
+            types.extend([tower_type] * len(cells))
+            costs.append(np.full(len(cells), tower_type['cost']))
+        return np.concatenate(covers), np.concatenate(owners), types, np.concatenate(costs)
+
+    def solve(self, attackers, existing=(), num_towers=None):
+        # Retorna [(x, y, tipo)]; tipo é None quando o solver não escolhe tipos.
+        # Alvos já ao alcance das torres existentes não contam como ganho
+        num_towers = self.num_towers if num_towers is None else num_towers
+        cells = self.candidates()
+        targets, weights = self.targets(attackers)
+        if num_towers <= 0 or len(cells) == 0:
+            return []
+
+        covered = np.zeros(len(targets), dtype=bool)
+        for tower in existing:
+            if len(targets):
+                covered |= self.covers(np.array([[tower.grid_x, tower.grid_y]]), targets, tower.range)[0]
+
+        cover, owners, types, costs = self.coverage_sets(cells, targets)
+        gains = (cover & ~covered) @ weights if len(targets) else np.zeros(len(owners))
+        # Empates: menor custo, depois ordem do candidato
+        heap = [(-gain, cost, i) for i, (gain, cost) in enumerate(zip(gains.tolist(), costs.tolist()))]
+        heapq.heapify(heap)
+
+        layout = []
+        used_cells = set()
+        while heap and len(layout) < num_towers:
+            neg_gain, cost, i = heapq.heappop(heap)
+            cell = int(owners[i])
+            if cell in used_cells:
+                continue
+            gain = float(weights[cover[i] & ~covered].sum()) if len(targets) else 0.0
+            if heap and gain < -heap[0][0]:
+                # Ganho desatualizado: volta para a fila com o valor novo
+                heapq.heappush(heap, (-gain, cost, i))
+                continue
+            if gain <= 0:
+                break  # Nada mais a cobrir: não gasta torres à toa
+            layout.append((int(cells[cell, 0]), int(cells[cell, 1]), types[i]))
+            used_cells.add(cell)
+            covered |= cover[i]
+        return layout
+
+    def run(self, attackers):
+        # Mesma interface de TowerPlacementGA.run: só as posições
+        return [(x, y) for x, y, _ in self.solve(attackers)]
+
+    def coverage(self, layout, attackers):
+        # Peso total coberto por um layout [(x, y, tipo)], para comparação
+        targets, weights = self.targets(attackers)
+        covered = np.zeros(len(targets), dtype=bool)
+        for x, y, tower_type in layout:
+            delta = np.abs(targets - (x, y))
+            if tower_type is None:
+                covered |= delta.sum(axis=1) <= self.coverage_radius
+            else:
+                covered |= (delta ** 2).sum(axis=1) <= tower_type['range'] ** 2
+        return float(weights[covered].sum())
@@ -0,0 +1,146 @@
+import multiprocessing
+import queue
+import time
+from genetic_tower import TowerPlacementGA, attacker_positions
+from event_log import events
+
+# Configurações padrão das ilhas: cada uma com a sua taxa de mutação e o seu
+# operador de crossover ('uniform' ou a fração do genoma que vem do primeiro pai)
+DEFAULT_ISLAND_SETTINGS = [
+    {'mutation_rate': 0.05, 'crossover': 'uniform'},
+    {'mutation_rate': 0.1, 'crossover': 0.25},
+    {'mutation_rate': 0.2, 'crossover': 0.5},
+    {'mutation_rate': 0.4, 'crossover': 0.75}
+]
+
+def crossover_options(settings, num_towers):
+    # Argumentos de crossover de TowerPlacementGA para as configurações de uma ilha
+    crossover = settings.get('crossover', 0.5)
+    if crossover == 'uniform':
+        return {'uniform_crossover': True}
+    return {'crossover_point': min(max(1, round(crossover * num_towers)), max(1, num_towers - 1))}
+
+def evolve_islands(optimizer, positions):
+    # Executado fora da thread do jogo (PlacementWorker), como evolve_placement
+    return optimizer, optimizer.run(positions)
+
+def run_island(game_map, positions, num_towers, population_size, settings, epochs,
+               migration_interval, migrants, send_conn, recv_conn, result_queue, island_id,
+               migration_timeout=30.0):
+    # Processo de uma ilha: evolui a sua população e troca os melhores
+    # indivíduos com as vizinhas do anel a cada migration_interval gerações
+    ga = TowerPlacementGA(
+        game_map, num_towers=num_towers, population_size=population_size,
+        mutation_rate=settings.get('mutation_rate', 0.1), **crossover_options(settings, num_towers)
+    )
+    best = []
+    for epoch in range(epochs):
+        best = ga.evolve(positions, migration_interval)
+        if epoch == epochs - 1:
+            break
+
+        scores = ga.cached_population_fitness(ga.population, positions)
+        ranked = sorted(range(len(ga.population)), key=lambda i: scores[i], reverse=True)
+        send_conn.send(ga.population[ranked[:migrants]])
+        # Vizinha que caiu não manda migrantes: a ilha segue sem eles
+        if not recv_conn.poll(migration_timeout):
+            continue
+        incoming = recv_conn.recv()
+        # Os migrantes substituem os piores indivíduos da ilha
+        worst = ranked[::-1][:len(incoming)]
+        ga.population[worst] = incoming[:len(worst)]
+        ga.repair_population()
+
+    best_score = ga.fitness(best, positions)
+    result_queue.put((island_id, best_score, best))
+
+class IslandModelOptimizer:
+    """Busca genética de posicionamento em várias ilhas, uma por processo.
+
+    Cada ilha tem sua própria taxa de mutação e operador de crossover; a cada
+    migration_interval gerações os melhores indivíduos migram para a próxima
+    ilha do anel por pipes.
+
+    Uma ilha que cai não trava a busca: as vizinhas seguem sem os seus
+    migrantes e run() devolve o melhor entre as ilhas que terminaram (ou
+    levanta RuntimeError se nenhuma terminou em timeout segundos).
+
+    start_method escolhe como os processos das ilhas são criados (None = padrão
+    do sistema); o jogo usa 'spawn', porque a busca roda fora da thread principal.
+    """
+
+    def __init__(self, game_map, num_towers=4, num_islands=None, island_settings=None,
+                 population_size=40, epochs=10, migration_interval=5, migrants=2,
+                 timeout=None, migration_timeout=30.0, start_method=None):
+        self.game_map = game_map
+        self.num_towers = num_towers
+        if island_settings is None:
+            count = num_islands or multiprocessing.cpu_count()
+            island_settings = [DEFAULT_ISLAND_SETTINGS[i % len(DEFAULT_ISLAND_SETTINGS)] for i in range(count)]
+        self.island_settings = island_settings
+        self.population_size = population_size
+        self.epochs = epochs
+        self.migration_interval = migration_interval
+        self.migrants = migrants
+        self.timeout = timeout  # Segundos para todas as ilhas; None = enquanto houver ilha viva
+        self.migration_timeout = migration_timeout
+        self.start_method = start_method
+        self.island_results = []
+
+
+    def run(self, attackers):
+        snapshot = self.game_map.copy()
+        positions = attacker_positions(attackers)
+        num_islands = len(self.island_settings)
+        context = multiprocessing.get_context(self.start_method)
+
+        # Anel: a ilha i envia pelo pipe i+1 e recebe pelo pipe i
+        pipes = [context.Pipe(duplex=False) for _ in range(num_islands)]
+        result_queue = context.Queue()
+        processes = []
+        for i, settings in enumerate(self.island_settings):
+            recv_conn = pipes[i][0]
+            send_conn = pipes[(i + 1) % num_islands][1]
+            process = context.Process(
+                target=run_island,
+                args=(snapshot, positions, self.num_towers, self.population_size, settings, self.epochs,
+                      self.migration_interval, self.migrants, send_conn, recv_conn, result_queue, i,
+                      self.migration_timeout),
+                daemon=True
+            )
+            process.start()
+            processes.append(process)
+
+        self.island_results = sorted(self._collect_results(result_queue, processes))
+        received = {island_id for island_id, _, _ in self.island_results}
+        failed = [i for i in range(num_islands) if i not in received]
+        if failed:
+            events.warning('island_failed', "Ilhas sem resultado: {islands} (códigos de saída {codes})",
+                           islands=failed, codes=[processes[i].exitcode for i in failed])
+        if not self.island_results:
+            raise RuntimeError("Nenhuma ilha do algoritmo genético terminou")
+
+        _, best_score, best = max(self.island_results, key=lambda result: result[1])
+        return best
+
+    def _collect_results(self, result_queue, processes):
+        # Lê os resultados sem bloquear para sempre: para quando todas as
+        # ilhas responderam, quando não há mais ilha viva ou no timeout
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        results = []
+        while len(results) < len(processes):
+            alive = any(process.is_alive() for process in processes)
+            try:
+                results.append(result_queue.get(timeout=0.5))
+                continue
+            except queue.Empty:
+                pass
+            if not alive or (deadline is not None and time.monotonic() > deadline):
+                break
+        for process in processes:
+            if len(results) == len(processes):
+                process.join(timeout=5.0)  # Já respondeu: só falta terminar de sair
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        return results
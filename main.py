@@ -1,8 +1,10 @@
+import argparse
 import pygame
 import sys
 from enum import Enum
 from game import Game
 from ui import UI
+from session_profiler import SessionProfiler
 
 class GameState(Enum):
     MENU = 1
@@ -11,7 +13,7 @@ class GameState(Enum):
     PAUSED = 4
 
 class Main:
-    def __init__(self):
+    def __init__(self, profile=None, profile_ticks=600, metrics_port=None, metrics_file=None):
         # Configurar Pygame para não usar áudio (evitar erros ALSA)
         import os
         os.environ['SDL_AUDIODRIVER'] = 'dummy'
@@ -35,6 +37,15 @@ class Main:
         # Instâncias dos módulos principais
         self.ui = UI(self.SCREEN_WIDTH, self.SCREEN_HEIGHT)
         self.game = Game(self.SCREEN_WIDTH, self.SCREEN_HEIGHT, self.ui)
+
+        if metrics_port is not None or metrics_file is not None:
+            self.game.enable_metrics_exporter(metrics_port, metrics_file)
+
+        # Perfis sob demanda: F5 = próximas N atualizações, F6 = partida atual, F7 = amostragem
+        self.profiler = SessionProfiler()
+        self.profile_ticks = profile_ticks
+        if profile:
+            self.profiler.start(profile, profile_ticks)
     def handle_events(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
@@ -54,6 +65,23 @@ class Main:
                         self.game_state = GameState.PLAYING
                         self.game.start_new_game()
                 
+                elif event.key == pygame.K_F3:
+                    # Liga/desliga a medição por fase e o painel de tempos
+                    self.ui.show_timing = self.game.timer.toggle()
+                
+                elif event.key == pygame.K_F5:
+                    self.profiler.toggle('ticks', self.profile_ticks)
+                
+                elif event.key == pygame.K_F6:
+                    self.profiler.toggle('episode')
+                
+                elif event.key == pygame.K_F7:
+                    self.profiler.toggle('sample')
+                
+                elif event.key == pygame.K_F8:
+                    # Primeiro toque liga o tracemalloc; os seguintes mostram o crescimento
+                    self.game.memory_monitor.snapshot_diff()
+                
                 elif event.key == pygame.K_r:
                     if self.game_state == GameState.GAME_OVER:
                         self.game_state = GameState.PLAYING
@@ -89,6 +117,7 @@ class Main:
         
         if self.game_state == GameState.PLAYING:
             game_result = self.game.update()
+            self.profiler.tick(game_result)
             if game_result == "game_over":
                 self.game_state = GameState.GAME_OVER
     
@@ -112,32 +141,61 @@ class Main:
             self.game.render(self.screen)
             self.ui.draw_game_over(self.screen, self.game.get_final_stats())
         
+        if self.ui.show_timing:
+            self.draw_timing_overlay()
+        
         # Atualizar a tela
-        pygame.display.flip()
+        with self.game.timer.span('flip'):
+            pygame.display.flip()
+
+    def draw_timing_overlay(self):
+        
+        info = [
+            f"FPS: {self.clock.get_fps():.1f}",
+            f"Atacantes: {len(self.game.attackers)}  Torres: {len(self.game.towers)}",
+            f"Estados Q: {len(self.game.q_learning_agent.q_table)}"
+        ]
+        self.ui.draw_timing_overlay(self.screen, self.game.timer.summary(), info)
     
     def run(self):
         
         print("Iniciando Jogo")
         print("Pressione ESPAÇO para começar ou ESC para sair")
         
+        timer = self.game.timer
         while self.running:
-            # Processar eventos
-            self.handle_events()
-            
-            # Atualizar lógica
-            self.update()
-            
-            # Renderizar
-            self.render()
+            with timer.span('frame'):
+                # Processar eventos
+                with timer.span('events'):
+                    self.handle_events()
+                
+                # Atualizar lógica
+                with timer.span('update'):
+                    self.update()
+                
+                # Renderizar
+                with timer.span('render'):
+                    self.render()
             
             # Controlar FPS
-            self.clock.tick(self.FPS)
+            with timer.span('wait'):
+                self.clock.tick(self.FPS)
         
         # Finalizar Pygame
+        self.profiler.stop()
+        self.game.close()
         pygame.quit()
         sys.exit()
 
 if __name__ == "__main__":
-    game = Main()
+    parser = argparse.ArgumentParser(description="Tower Defense com IA")
+    parser.add_argument("--profile", choices=SessionProfiler.MODES,
+                        help="perfila desde o início: ticks (N atualizações), episode (1 partida) ou sample (amostragem)")
+    parser.add_argument("--profile-ticks", type=int, default=600, help="atualizações perfiladas no modo ticks")
+    parser.add_argument("--metrics-port", type=int, help="serve métricas do Prometheus em 127.0.0.1:PORTA/metrics")
+    parser.add_argument("--metrics-file", help="grava as métricas periodicamente neste arquivo")
+    args = parser.parse_args()
+    game = Main(profile=args.profile, profile_ticks=args.profile_ticks,
+                metrics_port=args.metrics_port, metrics_file=args.metrics_file)
     game.run()
 
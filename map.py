@@ -1,5 +1,6 @@
 import pygame
 import random
+from collections import deque
 from enum import Enum
 
 class CellType(Enum):
@@ -33,12 +34,27 @@ class GameMap:
         self.start_pos = None
         self.end_pos = None
         self.path_points = []
+
+        # Versão do mapa: incrementada a cada alteração de célula
+        self.version = 0
+        self._flow_field = None
+        self._flow_field_version = -1
+
+        # Índice das células onde cabe torre, atualizado a cada set_cell:
+        # sorteio O(1) sem tentativas rejeitadas. O segundo índice exclui as
+        # zonas próximas ao início e ao fim
+        self.endpoint_exclusion_radius = 4
+        self._excluded_cells = frozenset()
+        self._placement_cells = []
+        self._placement_index = {}
+        self._safe_placement_cells = []
+        self._safe_placement_index = {}
         
         # Gerar mapa padrão
         self.generate_default_map()
     
-    def generate_default_map(self):
-        
+    def generate_default_map(self, rng=None):
+        # rng: random.Random da partida; None usa o módulo random
         # 1. Limpa o grid e a lista de pontos do caminho
         self.grid = [[CellType.EMPTY for _ in range(self.width)] for _ in range(self.height)]
         self.path_points = []
@@ -67,20 +83,21 @@ class GameMap:
 
 
         # 4. Adiciona obstáculos aleatórios
-        self.add_random_obstacles(15)
+        self.add_random_obstacles(15, rng)
+        self.rebuild_placement_index()
 
-    def generate_complex_map(self):
-        
+    def generate_complex_map(self, rng=None):
+        rng = rng if rng is not None else random
         self.grid = [[CellType.EMPTY for _ in range(self.width)] for _ in range(self.height)]
         
-        self.start_pos = (0, random.randint(1, self.height-2))
-        self.end_pos = (self.width - 1, random.randint(1, self.height-2))
+        self.start_pos = (0, rng.randint(1, self.height-2))
+        self.end_pos = (self.width - 1, rng.randint(1, self.height-2))
         
         self.path_points = self._find_path_A_star(self.start_pos, self.end_pos)
         
         if not self.path_points:
             # Fallback para um caminho simples se o A* falhar
-            self.generate_default_map()
+            self.generate_default_map(rng)
             return
             
         for x, y in self.path_points:
@@ -89,17 +106,18 @@ class GameMap:
         self.set_cell(self.start_pos[0], self.start_pos[1], CellType.START)
         self.set_cell(self.end_pos[0], self.end_pos[1], CellType.END)
         
-        self.add_random_obstacles(25)
+        self.add_random_obstacles(25, rng)
+        self.rebuild_placement_index()
 
-    def add_random_obstacles(self, count):
-        
+    def add_random_obstacles(self, count, rng=None):
+        rng = rng if rng is not None else random
         obstacles_added = 0
         attempts = 0
         max_attempts = count * 20
         
         while obstacles_added < count and attempts < max_attempts:
-            x = random.randint(0, self.width - 1)
-            y = random.randint(0, self.height - 1)
+            x = rng.randint(0, self.width - 1)
+            y = rng.randint(0, self.height - 1)
             
             # Garante que o obstáculo não seja colocado no caminho, início ou fim
             if self.get_cell(x, y) == CellType.EMPTY:
@@ -160,6 +178,112 @@ class GameMap:
         
         if 0 <= x < self.width and 0 <= y < self.height:
             self.grid[y][x] = cell_type
+            self.version += 1
+
+            pos = (x, y)
+            if cell_type in [CellType.EMPTY, CellType.PATH]:
+                self._index_add(self._placement_cells, self._placement_index, pos)
+                if pos not in self._excluded_cells:
+                    self._index_add(self._safe_placement_cells, self._safe_placement_index, pos)
+            else:
+                self._index_remove(self._placement_cells, self._placement_index, pos)
+                self._index_remove(self._safe_placement_cells, self._safe_placement_index, pos)
+
+    def _index_add(self, cells, index, pos):
+        if pos not in index:
+            index[pos] = len(cells)
+            cells.append(pos)
+
+    def _index_remove(self, cells, index, pos):
+        # Remoção O(1): a última célula ocupa a posição da removida
+        i = index.pop(pos, None)
+        if i is None:
+            return
+        last = cells.pop()
+        if last != pos:
+            cells[i] = last
+            index[last] = i
+
+    def rebuild_placement_index(self):
+        # Recalcula os índices e as zonas de exclusão (após gerar um mapa)
+        excluded = set()
+        radius = self.endpoint_exclusion_radius
+        for endpoint in [self.start_pos, self.end_pos]:
+            if endpoint:
+                for x in range(self.width):
+                    for y in range(self.height):
+                        if abs(x - endpoint[0]) + abs(y - endpoint[1]) < radius:
+                            excluded.add((x, y))
+        self._excluded_cells = frozenset(excluded)
+
+        self._placement_cells = []
+        self._placement_index = {}
+        self._safe_placement_cells = []
+        self._safe_placement_index = {}
+        for y in range(self.height):
+            for x in range(self.width):
+                if self.grid[y][x] in [CellType.EMPTY, CellType.PATH]:
+                    self._index_add(self._placement_cells, self._placement_index, (x, y))
+                    if (x, y) not in self._excluded_cells:
+                        self._index_add(self._safe_placement_cells, self._safe_placement_index, (x, y))
+
+    def placement_cells(self, avoid_endpoints=False):
+        # Células onde uma torre pode ser colocada agora (não modificar a lista)
+        return self._safe_placement_cells if avoid_endpoints else self._placement_cells
+
+    def is_near_endpoint(self, x, y):
+        return (x, y) in self._excluded_cells
+
+    def random_placement_cell(self, avoid_endpoints=False, rng=None):
+        rng = rng if rng is not None else random
+        cells = self.placement_cells(avoid_endpoints)
+        if not cells:
+            return None
+        return rng.choice(cells)
+
+    def sample_placement_cells(self, count, avoid_endpoints=False, rng=None):
+        # Até count células distintas, sem tentativas rejeitadas
+        rng = rng if rng is not None else random
+        cells = self.placement_cells(avoid_endpoints)
+        return rng.sample(cells, min(count, len(cells)))
+    
+    def copy(self):
+        # Cópia leve (grid e posições especiais) sem gerar um novo mapa;
+        # pode ser enviada para outra thread ou processo
+        clone = GameMap.__new__(GameMap)
+        clone.__dict__.update(self.__dict__)
+        clone.grid = [row[:] for row in self.grid]
+        clone.path_points = list(self.path_points)
+        clone._flow_field = None
+        clone._flow_field_version = -1
+        clone._placement_cells = list(self._placement_cells)
+        clone._placement_index = dict(self._placement_index)
+        clone._safe_placement_cells = list(self._safe_placement_cells)
+        clone._safe_placement_index = dict(self._safe_placement_index)
+        return clone
+    
+    def get_flow_field(self):
+        # Distância (em passos) de cada célula até o fim, via BFS a partir do END.
+        # Recalculada apenas quando o mapa muda.
+        if self._flow_field is not None and self._flow_field_version == self.version:
+            return self._flow_field
+
+        inf = float('inf')
+        field = [[inf for _ in range(self.width)] for _ in range(self.height)]
+        if self.end_pos:
+            end_x, end_y = self.end_pos
+            field[end_y][end_x] = 0
+            queue = deque([self.end_pos])
+            while queue:
+                x, y = queue.popleft()
+                for nx, ny in self.get_neighbors(x, y):
+                    if field[ny][nx] == inf:
+                        field[ny][nx] = field[y][x] + 1
+                        queue.append((nx, ny))
+
+        self._flow_field = field
+        self._flow_field_version = self.version
+        return field
     
     def get_neighbors(self, x, y):
         neighbors = []
@@ -0,0 +1,217 @@
+import math
+import multiprocessing
+import os
+import time
+import numpy as np
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from ai import QLearningAgent
+from simulation import HeadlessSimulation
+from event_log import events
+from tower import TowerType
+
+TOWER_TYPES = [TowerType.CANNON, TowerType.MISSILE, TowerType.LASER]
+
+def frozen_policy(q_table, epsilon):
+    # Agente que escolhe ações por uma cópia da tabela Q sem atualizá-la; as
+    # consultas criam entradas zeradas só na cópia, nunca na tabela do jogo
+    q_table = defaultdict(lambda: defaultdict(float), {k: defaultdict(float, v) for k, v in (q_table or {}).items()})
+    agent = QLearningAgent(epsilon=epsilon, q_table_file=None)
+    agent.q_table = q_table
+    agent.frozen = True
+    return agent
+
+def plain_q_table(q_table):
+    # Tabela Q sem defaultdicts com lambda, para enviar a outro processo
+    # list() copia os itens de uma vez, mesmo com o jogo inserindo estados em paralelo
+    return {k: dict(v) for k, v in list((q_table or {}).items())}
+
+def simulate_placements(root, actions, seed, horizon):
+    # Um rollout: as torres de actions entram agora e o jogo segue por horizon ticks.
+    # Determinístico dado o seed: o fork usa geradores próprios, sem tocar nos
+    # globais que a thread do jogo usa ao mesmo tempo
+    simulation = root.fork(seed=seed)
+    for x, y, type_index in actions:
+        simulation.place_tower(x, y, TOWER_TYPES[type_index])
+    with events.muted():
+        for _ in range(horizon):
+            simulation.step()
+    return simulation.eliminated, simulation.successful, len(simulation.attackers)
+
+def run_planner_batch(root, q_table, epsilon, jobs, horizon):
+    # Executado em um processo do pool: vários (ações, seed) sobre o mesmo estado
+    root = root.fork(frozen_policy(q_table, epsilon))
+    return [simulate_placements(root, actions, seed, horizon) for actions, seed in jobs]
+
+def plan_placement(planner, root, tower_budget):
+    # Executado fora da thread do jogo, como evolve_placement
+    action = planner.search(root, tower_budget)
+    return planner, [action] if action is not None else []
+
+class PlanNode:
+    __slots__ = ('parent', 'action', 'children', 'untried', 'visits', 'value')
+
+    def __init__(self, parent, action, untried):
+        self.parent = parent
+        self.action = action
+        self.children = []
+        self.untried = untried  # Ações ainda não expandidas, da melhor para a pior
+        self.visits = 0
+        self.value = 0.0
+
+    def actions(self):
+        # Sequência de torres do nó raiz até este nó
+        path = []
+        node = self
+        while node.parent is not None:
+            path.append(node.action)
+            node = node.parent
+        return path[::-1]
+
+class MCTSPlanner:
+    """Escolhe a próxima torre com busca em árvore de Monte Carlo (UCT).
+
+    A raiz é uma cópia do estado da partida (HeadlessSimulation.from_game).
+    Cada nó acrescenta uma torre (x, y, tipo) ao caminho desde a raiz; um
+    rollout aplica essas torres a um fork da raiz e roda o jogo sem
+    renderização por horizon ticks, com os atacantes seguindo a tabela Q atual
+    sem aprender. O valor é o saldo eliminados - bem-sucedidos, normalizado
+    para [-1, 1]. A busca para ao fim de time_budget segundos (ou
+    max_iterations) e devolve a ação mais visitada da raiz.
+
+    Com workers > 1 as folhas são escolhidas em lotes (com perda virtual para
+    diversificar) e simuladas em um pool de processos.
+    """
+
+    def __init__(self, time_budget=1.0, max_iterations=None, horizon=300, max_depth=2, num_actions=8,
+                 exploration=1.4, epsilon=0.05, workers=1, seed=0):
+        self.time_budget = time_budget
+        self.max_iterations = max_iterations
+        self.horizon = horizon  # Ticks simulados por rollout
+        self.max_depth = max_depth  # Torres planejadas à frente
+        self.num_actions = num_actions  # Melhores (célula, tipo) pelo prior
+        self.exploration = exploration
+        self.epsilon = epsilon
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self.seed = seed
+        self.q_table = None  # Cópia em dicts simples, feita na thread do jogo
+        self.policy_root = None
+        self.actions = []
+        self.executor = None
+        self.last_stats = {}
+
+    def __getstate__(self):
+        # O pool e a raiz da busca em andamento não vão junto
+        state = self.__dict__.copy()
+        state['executor'] = None
+        state['policy_root'] = None
+        return state
+
+    def snapshot(self, game):
+        # Deve rodar na thread do jogo: a busca (em outra thread) só lê a cópia da tabela Q
+        self.q_table = plain_q_table(game.q_learning_agent.q_table)
+        return HeadlessSimulation.from_game(game)
+
+    def candidate_actions(self, root):
+        # Prior barato: células do caminho e atacantes ao alcance de cada (célula, tipo)
+        game_map = root.game_map
+        cells = sorted(game_map.placement_cells(avoid_endpoints=True), key=lambda c: (c[1], c[0]))
+        if not cells:
+            return []
+        cells = np.array(cells)
+        targets = list(game_map.path_points) + [(a.grid_x, a.grid_y) for a in root.attackers] * 2
+        targets = np.array(targets, dtype=np.int64).reshape(-1, 2)
+        dist_sq = ((cells[:, None, :] - targets[None, :, :]) ** 2).sum(axis=2)
+        scored = []
+        for type_index, tower_type in enumerate(TOWER_TYPES):
+            scores = (dist_sq <= tower_type['range'] ** 2).sum(axis=1)
+            for (x, y), score in zip(cells.tolist(), scores.tolist()):
+                scored.append((-score, tower_type['cost'], y, x, type_index))
+        scored.sort()
+        return [(x, y, type_index) for _, _, y, x, type_index in scored[:self.num_actions]]
+
+    def _get_executor(self):
+        if self.executor is None and self.workers > 1:
+            # spawn: o pool é criado fora da thread principal de um processo com pygame
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self.executor
+
+    def _select(self, root, depth):
+        node = root
+        while True:
+            if node.untried and len(node.actions()) < depth:
+                action = node.untried.pop(0)
+                used = {(x, y) for x, y, _ in node.actions()} | {(action[0], action[1])}
+                child = PlanNode(node, action, [a for a in self.actions if (a[0], a[1]) not in used])
+                node.children.append(child)
+                return child
+            if not node.children:
+                return node
+            log_visits = math.log(node.visits + 1)
+            node = max(node.children, key=lambda c: c.value / (c.visits + 1e-9) +
+                       self.exploration * math.sqrt(log_visits / (c.visits + 1e-9)))
+
+    def _backup(self, node, reward):
+        while node is not None:
+            node.visits += 1
+            node.value += reward
+            node = node.parent
+
+    def _run(self, root, jobs):
+        executor = self._get_executor()
+        if executor is None:
+            if self.policy_root is None:
+                self.policy_root = root.fork(frozen_policy(self.q_table, self.epsilon))
+            return [simulate_placements(self.policy_root, actions, seed, self.horizon) for actions, seed in jobs]
+        q_table = self.q_table
+        chunk_size = -(-len(jobs) // self.workers)
+        chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        futures = [executor.submit(run_planner_batch, root, q_table, self.epsilon, chunk, self.horizon)
+                   for chunk in chunks]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def search(self, root, tower_budget=1):
+        # Retorna a próxima torre (x, y, tipo) ou None
+        depth = min(self.max_depth, tower_budget)
+        self.actions = self.candidate_actions(root)
+        if depth <= 0 or not self.actions:
+            return None
+
+        self.policy_root = None  # Uma cópia da política por busca, não por rollout
+        tree = PlanNode(None, None, list(self.actions))
+        deadline = time.perf_counter() + self.time_budget
+        iterations = 0
+        while time.perf_counter() < deadline:
+            if self.max_iterations is not None and iterations >= self.max_iterations:
+                break
+            leaves = []
+            for _ in range(max(1, self.workers)):
+                leaf = self._select(tree, depth)
+                leaf.visits += 1  # Perda virtual até o resultado voltar
+                leaves.append(leaf)
+            jobs = [(leaf.actions(), self.seed + iterations + k) for k, leaf in enumerate(leaves)]
+            for leaf, (eliminated, successful, alive) in zip(leaves, self._run(root, jobs)):
+                leaf.visits -= 1
+                self._backup(leaf, (eliminated - successful) / max(1, eliminated + successful + alive))
+            iterations += len(leaves)
+
+        self.policy_root = None
+        if not tree.children:
+            return None
+        best = max(tree.children, key=lambda c: (c.visits, c.value))
+        self.last_stats = {
+            'iterations': iterations,
+            'actions': len(self.actions),
+            'best_visits': best.visits,
+            'best_value': best.value / best.visits if best.visits else 0
+        }
+        x, y, type_index = best.action
+        return x, y, TOWER_TYPES[type_index]
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,152 @@
+import itertools
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+from event_log import events
+
+MB = 1024 * 1024
+
+def q_table_size(q_table, sample_size=5000):
+    # Bytes aproximados: dict externo, chaves (str do estado) e dicts internos com seus floats.
+    # Tabelas grandes são estimadas por ~sample_size estados espalhados pela
+    # ordem de inserção, sem copiar a tabela
+    states = len(q_table)
+    step = max(1, states // sample_size)
+    per_state = 0
+    sampled = 0
+    for key, actions in itertools.islice(q_table.items(), 0, None, step):
+        per_state += sys.getsizeof(key) + sys.getsizeof(actions) + 24 * len(actions)
+        sampled += 1
+    scale = states / max(sampled, 1)
+    return int(sys.getsizeof(q_table) + per_state * scale), states
+
+def logger_size(data_logger):
+    total = sum(array.nbytes for array in data_logger.columns.values())
+    total += sum(sys.getsizeof(value) for values in data_logger.categories.values() for value in values)
+    return total, data_logger.size
+
+def attackers_size(attackers):
+    # Memória por atacante que cresce com o tempo: posições perigosas e histórico de posições
+    total = 0
+    for attacker in attackers:
+        total += sys.getsizeof(attacker.observed_attacks) + 84 * len(attacker.observed_attacks)
+        total += sys.getsizeof(attacker.last_positions) + 64 * len(attacker.last_positions)
+    return total, len(attackers)
+
+class MemoryBudgetWarning(UserWarning):
+    # Estrutura acima do orçamento de memória (visível com os filtros padrão)
+    pass
+
+class MemoryMonitor:
+    """Tamanho aproximado das estruturas que crescem durante o treino.
+
+    A cada interval segundos mede a tabela Q, o histórico do GameDataLogger e
+    os atacantes (vivos e reciclados no pool), guarda o resultado em
+    last_report e registra um resumo no event_log. Uma estrutura acima do seu
+    orçamento (budgets, em MB; None desliga) gera um MemoryBudgetWarning e, com
+    compact=True, uma compactação: estados Q sem valores aprendidos saem da
+    tabela, o histórico em memória vira um buffer circular com as linhas mais
+    recentes (o resto já está em disco) e o pool de atacantes é esvaziado.
+
+    snapshot_diff() usa tracemalloc para mostrar onde a memória cresceu desde
+    a chamada anterior.
+    """
+
+    DEFAULT_BUDGETS = {'q_table': 512, 'data_logger': 64, 'attackers': 16}
+
+    def __init__(self, game, interval=60.0, budgets=None, compact=True, verbose=True, out_dir="runs/memory"):
+        self.game = game
+        self.interval = interval
+        self.budgets = dict(self.DEFAULT_BUDGETS if budgets is None else budgets)
+        self.compact = compact
+        self.verbose = verbose
+        self.out_dir = out_dir
+        self.last_check = time.time()
+        self.last_report = {}
+        self.last_snapshot = None
+
+    def report(self):
+        # {estrutura: (bytes, itens)}
+        game = self.game
+        report = {'q_table': q_table_size(game.q_learning_agent.q_table)}
+        if hasattr(game, 'data_logger'):
+            report['data_logger'] = logger_size(game.data_logger)
+        report['attackers'] = attackers_size(list(game.attackers) + list(game.attacker_pool.free))
+        if tracemalloc.is_tracing():
+            report['traced'] = (tracemalloc.get_traced_memory()[0], None)
+        self.last_report = report
+        return report
+
+    def check(self, now=None):
+        # Chamado a cada atualização; só mede quando o intervalo venceu
+        now = time.time() if now is None else now
+        if now - self.last_check < self.interval:
+            return None
+        self.last_check = now
+        report = self.report()
+        if self.verbose:
+            events.info('memory_report', "Memória: {summary}",
+                        summary=", ".join(self.describe(name, size, items) for name, (size, items) in report.items()))
+        for name, (size, _) in report.items():
+            budget = self.budgets.get(name)
+            if budget is not None and size > budget * MB:
+                self.over_budget(name, size, budget)
+        return report
+
+    def describe(self, name, size, items):
+        text = f"{name} {size / MB:.1f} MB"
+        return text if items is None else f"{text} ({items} itens)"
+
+    def over_budget(self, name, size, budget):
+        message = f"{name} usa {size / MB:.1f} MB, acima do orçamento de {budget} MB"
+        if self.compact:
+            freed = self.compact_structure(name, size, budget)
+            if freed is not None:
+                message += f"; compactado: {freed}"
+        events.warning('memory_budget', message)
+        warnings.warn(message, MemoryBudgetWarning, stacklevel=2)
+
+    def compact_structure(self, name, size, budget):
+        game = self.game
+        if name == 'q_table':
+            removed = game.q_learning_agent.compact_q_table()
+            return f"{removed} valores Q zerados removidos"
+        if name == 'data_logger':
+            logger = game.data_logger
+            keep = max(1, int(logger.size * budget * MB / size / 2))
+            logger.trim(keep)
+            return f"histórico em memória limitado a {keep} linhas"
+        if name == 'attackers':
+            released = game.attacker_pool.compact()
+            return f"{released} atacantes reciclados descartados"
+        return None
+
+    def snapshot_diff(self, top_n=15):
+        # Primeira chamada liga o tracemalloc; as seguintes comparam com a anterior
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self.last_snapshot = tracemalloc.take_snapshot()
+            print("tracemalloc iniciado; chame de novo para ver o crescimento")
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        stats = snapshot.compare_to(self.last_snapshot, 'lineno')
+        self.last_snapshot = snapshot
+        lines = [f"Crescimento desde o último snapshot (total rastreado {tracemalloc.get_traced_memory()[0] / MB:.1f} MB):"]
+        for stat in stats[:top_n]:
+            frame = stat.traceback[0]
+            lines.append(f"  {stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocos  "
+                         f"{os.path.basename(frame.filename)}:{frame.lineno}")
+        text = "\n".join(lines)
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, time.strftime("tracemalloc-%Y%m%d-%H%M%S.txt"))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(text)
+        return path
+
+    def stop_tracing(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.last_snapshot = None
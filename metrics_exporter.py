@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# (nome, tipo, descrição) de cada métrica exportada
+METRICS = [
+    ('td_ticks_total', 'counter', 'Atualizações do jogo desde o início do processo'),
+    ('td_ticks_per_second', 'gauge', 'Atualizações por segundo na última janela'),
+    ('td_matches_total', 'counter', 'Partidas iniciadas'),
+    ('td_attackers_alive', 'gauge', 'Atacantes ativos'),
+    ('td_attackers_eliminated', 'gauge', 'Atacantes eliminados na partida atual'),
+    ('td_attackers_successful', 'gauge', 'Atacantes que chegaram ao destino na partida atual'),
+    ('td_towers', 'gauge', 'Torres no mapa'),
+    ('td_score', 'gauge', 'Pontuação da partida atual'),
+    ('td_q_table_states', 'gauge', 'Estados na tabela Q'),
+    ('td_epsilon', 'gauge', 'Epsilon atual do Q-learning'),
+    ('td_ga_generation', 'gauge', 'Gerações do algoritmo genético de posicionamento'),
+    ('td_ga_best_fitness', 'gauge', 'Melhor fitness da última geração do algoritmo genético'),
+    ('td_phase_seconds', 'summary', 'Duração das fases do quadro (janela recente)')
+]
+
+def format_metrics(snapshot):
+    # Formato de texto do Prometheus (versão 0.0.4)
+    lines = []
+    for name, kind, help_text in METRICS:
+        value = snapshot.get(name)
+        if value is None:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if name == 'td_phase_seconds':
+            for phase, p50, p99 in value:
+                lines.append(f'{name}{{phase="{phase}",quantile="0.5"}} {p50:.9g}')
+                lines.append(f'{name}{{phase="{phase}",quantile="0.99"}} {p99:.9g}')
+        else:
+            lines.append(f"{name} {value:.9g}" if isinstance(value, float) else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+class MetricsExporter:
+    """Métricas do jogo para monitoramento ao vivo, fora da thread do jogo.
+
+    O jogo chama tick() a cada atualização, o que só incrementa um contador;
+    a cada publish_interval segundos monta um dict novo com os valores atuais
+    e troca a referência em self.snapshot (sem locks: o dict publicado nunca
+    é alterado). Uma thread em segundo plano serve o último snapshot em
+    http://host:port/metrics no formato do Prometheus e/ou o grava em
+    file_path (troca atômica, para o coletor de arquivos de texto do
+    node_exporter) a cada file_interval segundos.
+    """
+
+    def __init__(self, game, host="127.0.0.1", port=9464, file_path=None, publish_interval=1.0, file_interval=5.0):
+        self.game = game
+        self.host = host
+        self.port = port
+        self.file_path = file_path
+        self.publish_interval = publish_interval
+        self.file_interval = file_interval
+
+        self.ticks = 0
+        self.matches = 0
+        self.last_publish = time.time()
+        self.last_publish_ticks = 0
+        self.snapshot = {}
+
+        self.server = None
+        self.threads = []
+        self.stopping = threading.Event()
+
+    def start(self):
+        self.publish()
+        if self.port is not None:
+            exporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/metrics", "/"):
+                        self.send_error(404)
+                        return
+                    body = format_metrics(exporter.snapshot).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass  # Sem uma linha no terminal por coleta
+
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self.server.daemon_threads = True
+            self.port = self.server.server_address[1]  # port=0 escolhe uma porta livre
+            self.threads.append(threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True))
+            print(f"Métricas em http://{self.host}:{self.port}/metrics")
+        if self.file_path is not None:
+            self.threads.append(threading.Thread(target=self._write_file_loop, name="metrics-file", daemon=True))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def tick(self, now):
+        # Chamado pela thread do jogo a cada atualização
+        self.ticks += 1
+        if now - self.last_publish >= self.publish_interval:
+            self.publish(now)
+
+    def match_started(self):
+        self.matches += 1
+
+    def publish(self, now=None):
+        now = time.time() if now is None else now
+        game = self.game
+        elapsed = now - self.last_publish
+        snapshot = {
+            'td_ticks_total': self.ticks,
+            'td_ticks_per_second': (self.ticks - self.last_publish_ticks) / elapsed if elapsed > 0 else 0.0,
+            'td_matches_total': self.matches,
+            'td_attackers_alive': len(game.attackers),
+            'td_attackers_eliminated': game.stats['eliminated_attackers'],
+            'td_attackers_successful': game.stats['successful_attackers'],
+            'td_towers': len(game.towers),
+            'td_score': game.stats['score'],
+            'td_q_table_states': len(game.q_learning_agent.q_table),
+            'td_epsilon': float(game.q_learning_agent.epsilon)
+        }
+        if game.tower_ga is not None:
+            history = game.tower_ga.engine.best_history
+            snapshot['td_ga_generation'] = len(history)
+            if history:
+                snapshot['td_ga_best_fitness'] = float(history[-1])
+        if game.timer.enabled:
+            snapshot['td_phase_seconds'] = [(name, p50 / 1e3, p99 / 1e3) for name, p50, p99, _ in game.timer.summary()]
+        self.last_publish = now
+        self.last_publish_ticks = self.ticks
+        self.snapshot = snapshot  # Troca de referência: leitores veem o dict antigo ou o novo
+
+    def _write_file_loop(self):
+        while not self.stopping.wait(self.file_interval):
+            self.write_file()
+
+    def write_file(self):
+        tmp_path = self.file_path + ".tmp"
+        try:
+            directory = os.path.dirname(self.file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                f.write(format_metrics(self.snapshot))
+            os.replace(tmp_path, self.file_path)
+        except OSError as e:
+            print(f"Erro ao gravar métricas em {self.file_path}: {e}")
+
+    def close(self):
+        self.stopping.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.file_path is not None:
+            self.publish()
+            self.write_file()
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        self.threads = []
@@ -0,0 +1,169 @@
+import gzip
+import io
+import json
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+class MetricsStreamWriter:
+    """Grava as métricas da partida em disco numa thread separada.
+
+    O jogo só coloca linhas (tempo, itens do dict de métricas) numa fila, o que
+    nunca bloqueia. A thread de escrita junta as linhas em lotes e grava cada
+    lote como um arquivo comprimido independente no diretório da partida
+    (chunk-00000.csv.gz ou chunk-00000.npz), atualizando em seguida o
+    manifest.json. Como o manifesto só lista lotes completos e é trocado de
+    forma atômica, uma queda do jogo perde no máximo o lote em memória.
+    """
+
+    FORMATS = ('csv.gz', 'npz')
+
+    def __init__(self, base_dir="runs", run_name=None, fmt='csv.gz', batch_rows=1024, flush_interval=2.0):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Formato desconhecido: {fmt}")
+        self.fmt = fmt
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval  # Segundos máximos de uma linha na fila
+
+        if run_name is None:
+            run_name = time.strftime("run-%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+        self.run_dir = os.path.join(base_dir, run_name)
+        os.makedirs(self.run_dir, exist_ok=True)
+
+        self.manifest = {
+            'run': run_name,
+            'format': fmt,
+            'started_at': time.time(),
+            'finished_at': None,
+            'status': 'running',
+            'columns': ['time'],
+            'rows': 0,
+            'chunks': []
+        }
+        self._write_manifest()
+
+        self.queue = queue.SimpleQueue()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, game_time, items):
+        # items: tupla de (nome, valor), já desacoplada do dict que o jogo altera
+        if not self.closed:
+            self.queue.put((game_time, items))
+
+    def close(self, wait=True):
+        # Grava o que falta e marca a partida como completa no manifesto
+        if not self.closed:
+            self.closed = True
+            self.queue.put(None)
+        if wait:
+            self.thread.join()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                row = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                row = ()
+            if row is None:
+                break
+            if row:
+                batch.append(row)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (len(batch) >= self.batch_rows or time.monotonic() >= deadline):
+                self._write_chunk(batch)
+                batch = []
+                deadline = None
+
+        if batch:
+            self._write_chunk(batch)
+        self.manifest['status'] = 'complete'
+        self.manifest['finished_at'] = time.time()
+        self._write_manifest()
+
+    def _columns(self, batch):
+        # Colunas na ordem em que apareceram; métricas novas entram no fim
+        columns = self.manifest['columns']
+        for _, items in batch:
+            for name, _ in items:
+                if name not in columns:
+                    columns.append(name)
+        values = {name: [None] * len(batch) for name in columns}
+        for i, (game_time, items) in enumerate(batch):
+            values['time'][i] = game_time
+            for name, value in items:
+                values[name][i] = value
+        return columns, values
+
+    def _write_chunk(self, batch):
+        columns, values = self._columns(batch)
+        index = len(self.manifest['chunks'])
+        filename = f"chunk-{index:05d}.{self.fmt}"
+        path = os.path.join(self.run_dir, filename)
+        try:
+            if self.fmt == 'npz':
+                arrays = {name: np.array(['' if v is None else v for v in column])
+                          if any(isinstance(v, str) for v in column)
+                          else np.array([np.nan if v is None else v for v in column], dtype=float)
+                          for name, column in values.items()}
+                np.savez_compressed(path, **arrays)
+            else:
+                text = io.StringIO()
+                text.write(",".join(columns) + "\n")
+                for row in zip(*(values[name] for name in columns)):
+                    text.write(",".join("" if v is None else str(v) for v in row) + "\n")
+                with gzip.open(path, "wt", newline="") as f:
+                    f.write(text.getvalue())
+        except OSError as e:
+            print(f"Erro ao gravar métricas em {path}: {e}")
+            return
+
+        self.manifest['chunks'].append({
+            'file': filename,
+            'rows': len(batch),
+            'start_time': batch[0][0],
+            'end_time': batch[-1][0]
+        })
+        self.manifest['rows'] += len(batch)
+        self._write_manifest()
+
+    def _write_manifest(self):
+        # Troca atômica: o manifesto em disco está sempre completo
+        path = os.path.join(self.run_dir, "manifest.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, path)
+
+def read_run(run_dir):
+    # Lê os lotes listados no manifesto e devolve {coluna: array}
+    with open(os.path.join(run_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    parts = {name: [] for name in manifest['columns']}
+    for chunk in manifest['chunks']:
+        path = os.path.join(run_dir, chunk['file'])
+        if manifest['format'] == 'npz':
+            with np.load(path) as data:
+                columns = {name: data[name] for name in data.files}
+        else:
+            with gzip.open(path, "rt") as f:
+                header = f.readline().rstrip("\n").split(",")
+                rows = [line.rstrip("\n").split(",") for line in f]
+            columns = {name: [row[i] for row in rows] for i, name in enumerate(header)}
+        for name in parts:
+            column = columns.get(name, [''] * chunk['rows'])
+            parts[name].extend(list(column))
+    data = {}
+    for name, values in parts.items():
+        try:
+            data[name] = np.array([np.nan if v in ('', None) else float(v) for v in values])
+        except (TypeError, ValueError):
+            data[name] = np.array([str(v) for v in values])
+    return manifest, data
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from genetic_tower import attacker_positions
+from event_log import events
+
+def evolve_placement(ga, positions, generations):
+    # Executado fora da thread do jogo; ga.game_map é um snapshot do mapa
+    best = ga.evolve(positions, generations)
+    return ga, best
+
+class PlacementWorker:
+    # Roda o algoritmo genético de posicionamento em segundo plano para que o
+    # loop de renderização não pare enquanto a IA pensa
+
+    def __init__(self, use_processes=False):
+        self.use_processes = use_processes
+        self.executor = None
+        self.future = None
+        self.map_version = None
+
+    def _get_executor(self):
+        if self.executor is None:
+            if self.use_processes:
+                self.executor = ProcessPoolExecutor(max_workers=1)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=1)
+        return self.executor
+
+    def busy(self):
+        return self.future is not None
+
+    def submit(self, ga, game_map, attackers, generations):
+        # Uma busca por vez; a GA recebe uma cópia do mapa atual
+        if self.future is not None:
+            return False
+        snapshot = game_map.copy()
+        ga.game_map = snapshot
+        return self.submit_task(evolve_placement, (ga, attacker_positions(attackers), generations), snapshot.version)
+
+    def submit_task(self, fn, args, map_version):
+        # Qualquer busca que retorne (buscador, melhor resultado), ex.: plan_placement
+        if self.future is not None:
+            return False
+        self.map_version = map_version
+        self.future = self._get_executor().submit(fn, *args)
+        return True
+
+    def poll(self):
+        # Retorna (buscador, melhor resultado, versão do mapa) quando a busca termina
+        if self.future is None or not self.future.done():
+            return None
+        future = self.future
+        self.future = None
+        try:
+            searcher, best = future.result()
+        except Exception as e:
+            events.error('placement_failed', "Erro no posicionamento em segundo plano: {error}", error=e)
+            return None
+        return searcher, best, self.map_version
+
+    def discard(self):
+        # Ignora o resultado da busca em andamento (ex.: nova partida)
+        if self.future is not None:
+            self.future.cancel()
+        self.future = None
+
+    def close(self):
+        self.discard()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
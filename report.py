@@ -0,0 +1,162 @@
+# Gera gráficos das partidas gravadas em runs/, fora do loop do jogo:
+#   python report.py                       # todas as partidas em runs/
+#   python report.py runs/run-A runs/run-B --out reports --format both
+import argparse
+import base64
+import glob
+import html
+import os
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # Sem janelas: funciona em máquinas sem display
+import matplotlib.pyplot as plt
+from metrics_writer import read_run
+
+# (coluna, rótulo, cor) de cada gráfico
+PANELS = [
+    ("Atacantes Eliminados vs Bem-sucedidos", "Atacantes",
+     [("eliminated_attackers", "Eliminados", None), ("successful_attackers", "Bem-sucedidos", None)]),
+    ("Pontuação ao Longo do Tempo", "Pontuação", [("score", "Pontuação", "purple")]),
+    ("Torres Colocadas", "Torres", [("towers", "Torres", "orange")]),
+    ("Atacantes Ativos", "Atacantes", [("active_attackers", "Ativos", "gray")])
+]
+
+def find_runs(paths):
+    # Aceita diretórios de partida ou diretórios que contêm partidas
+    runs = []
+    for path in paths:
+        if os.path.exists(os.path.join(path, "manifest.json")):
+            runs.append(path)
+        else:
+            runs.extend(sorted(os.path.dirname(p) for p in glob.glob(os.path.join(path, "*", "manifest.json"))))
+    return runs
+
+def load_runs(run_dirs):
+    runs = []
+    for run_dir in run_dirs:
+        try:
+            manifest, data = read_run(run_dir)
+        except (OSError, ValueError) as e:
+            print(f"Ignorando {run_dir}: {e}")
+            continue
+        if manifest['rows']:
+            runs.append((manifest, data))
+    return runs
+
+def plot_run(manifest, data, filename):
+    fig, axes = plt.subplots(2, 2, figsize=(12, 6))
+    for ax, (title, ylabel, series) in zip(axes.flat, PANELS):
+        for column, label, color in series:
+            if column in data:
+                ax.plot(data['time'], data[column], label=label, color=color)
+        ax.set_xlabel("Tempo (s)")
+        ax.set_ylabel(ylabel)
+        ax.set_title(title)
+        if len(series) > 1:
+            ax.legend()
+    fig.suptitle(manifest['run'])
+    fig.tight_layout()
+    fig.savefig(filename, dpi=100)
+    plt.close(fig)
+
+def resample(runs, column, points=200):
+    # Cada partida interpolada numa grade de tempo comum; NaN após o fim da partida
+    duration = max(data['time'][-1] for _, data in runs)
+    grid = np.linspace(0, duration, points)
+    rows = []
+    for _, data in runs:
+        if column not in data:
+            continue
+        values = np.interp(grid, data['time'], data[column])
+        values[grid > data['time'][-1]] = np.nan
+        rows.append(values)
+    return grid, np.array(rows).reshape(-1, points)
+
+def plot_aggregate(runs, filename):
+    # Média e faixas de percentis (10-90 e 25-75) entre as partidas
+    columns = [(column, label) for _, _, series in PANELS for column, label, _ in series]
+    fig, axes = plt.subplots(2, 3, figsize=(15, 6))
+    for ax in axes.flat[len(columns):]:
+        ax.set_visible(False)
+    for ax, (column, label) in zip(axes.flat, columns):
+        grid, values = resample(runs, column)
+        if not len(values):
+            continue
+        alive = np.isfinite(values).any(axis=0)
+        grid, values = grid[alive], values[:, alive]
+        p10, p25, p75, p90 = np.nanpercentile(values, [10, 25, 75, 90], axis=0)
+        ax.fill_between(grid, p10, p90, alpha=0.2, label="p10-p90")
+        ax.fill_between(grid, p25, p75, alpha=0.3, label="p25-p75")
+        ax.plot(grid, np.nanmean(values, axis=0), label="Média")
+        ax.set_xlabel("Tempo (s)")
+        ax.set_title(label)
+        ax.legend()
+    fig.suptitle(f"{len(runs)} partidas")
+    fig.tight_layout()
+    fig.savefig(filename, dpi=100)
+    plt.close(fig)
+
+def final_stats(manifest, data):
+    stats = {'run': manifest['run'], 'duration': float(data['time'][-1]), 'status': manifest['status']}
+    for column in ['eliminated_attackers', 'successful_attackers', 'score', 'towers']:
+        if column in data:
+            stats[column] = float(data[column][-1])
+    return stats
+
+def write_html(images, summaries, filename):
+    # Página única com os gráficos embutidos e a tabela final de cada partida
+    columns = list(summaries[0].keys()) if summaries else []
+    parts = ["<html><head><meta charset='utf-8'><title>Relatório</title></head><body>",
+             "<h1>Relatório das partidas</h1>", "<table border='1'><tr>"]
+    parts += [f"<th>{html.escape(c)}</th>" for c in columns]
+    parts.append("</tr>")
+    for summary in summaries:
+        parts.append("<tr>" + "".join(f"<td>{html.escape(str(summary[c]))}</td>" for c in columns) + "</tr>")
+    parts.append("</table>")
+    for title, path in images:
+        with open(path, "rb") as f:
+            encoded = base64.b64encode(f.read()).decode("ascii")
+        parts.append(f"<h2>{html.escape(title)}</h2><img src='data:image/png;base64,{encoded}'>")
+    parts.append("</body></html>")
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write("\n".join(parts))
+
+def generate_report(paths, out_dir="reports", fmt="png"):
+    runs = load_runs(find_runs(paths))
+    if not runs:
+        print("Nenhuma partida encontrada.")
+        return []
+    os.makedirs(out_dir, exist_ok=True)
+
+    images = []
+    for manifest, data in runs:
+        path = os.path.join(out_dir, f"{manifest['run']}.png")
+        plot_run(manifest, data, path)
+        images.append((manifest['run'], path))
+    if len(runs) > 1:
+        path = os.path.join(out_dir, "aggregate.png")
+        plot_aggregate(runs, path)
+        images.insert(0, ("Todas as partidas", path))
+
+    outputs = [path for _, path in images]
+    if fmt in ("html", "both"):
+        path = os.path.join(out_dir, "report.html")
+        write_html(images, [final_stats(manifest, data) for manifest, data in runs], path)
+        outputs.append(path)
+        if fmt == "html":
+            for _, image in images:
+                os.remove(image)
+            outputs = [path]
+    print(f"Relatório de {len(runs)} partidas em {out_dir}")
+    return outputs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera gráficos das partidas gravadas")
+    parser.add_argument("paths", nargs="*", default=["runs"], help="partidas ou diretórios de partidas")
+    parser.add_argument("--out", default="reports", help="diretório de saída")
+    parser.add_argument("--format", choices=["png", "html", "both"], default="png")
+    args = parser.parse_args(argv)
+    generate_report(args.paths, args.out, args.format)
+
+if __name__ == "__main__":
+    main()
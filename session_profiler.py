@@ -0,0 +1,194 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def subsystem(filename):
+    # Módulo do jogo (attacker_group, tower, ...), pacote externo (pygame, numpy) ou python
+    if filename.startswith("~") or filename.startswith("<"):
+        return "builtins"
+    path = os.path.abspath(filename)
+    if os.path.dirname(path) == PROJECT_DIR:
+        return os.path.splitext(os.path.basename(path))[0]
+    parts = path.split(os.sep)
+    if "site-packages" in parts:
+        index = parts.index("site-packages")
+        if index + 1 < len(parts):
+            return os.path.splitext(parts[index + 1])[0]
+    return "python"
+
+class StackSampler:
+    """Amostragem periódica da pilha de uma thread, para sessões longas.
+
+    Uma thread auxiliar lê a pilha da thread alvo a cada interval segundos
+    (sys._current_frames) e conta as pilhas vistas. O custo não depende de
+    quantas funções o jogo chama, só da frequência de amostragem.
+    """
+
+    def __init__(self, interval=0.005, thread_id=None):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.main_thread().ident
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def _run(self):
+        while not self.stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def write_folded(self, filename):
+        # Formato "pilha;colapsada contagem" aceito por flamegraph.pl e speedscope
+        with open(filename, "w") as f:
+            for stack, count in self.stacks.most_common():
+                names = ";".join(f"{subsystem(path)}:{name}" for path, _, name in stack)
+                f.write(f"{names} {count}\n")
+
+    def summary(self, top_n):
+        own = Counter()
+        inclusive = Counter()
+        by_subsystem = Counter()
+        for stack, count in self.stacks.items():
+            path, line, name = stack[-1]
+            own[(path, line, name)] += count
+            by_subsystem[subsystem(path)] += count
+            for entry in set(stack):
+                inclusive[entry] += count
+        total = max(self.samples, 1)
+        lines = [f"{self.samples} amostras a cada {self.interval * 1000:.1f} ms", "", "Por subsistema (tempo próprio):"]
+        lines += [f"  {name:<24}{100 * count / total:6.1f}%" for name, count in by_subsystem.most_common()]
+        lines += ["", f"Top {top_n} funções (próprio / inclusivo):"]
+        for (path, line, name), count in own.most_common(top_n):
+            share = 100 * inclusive[(path, line, name)] / total
+            lines.append(f"  {100 * count / total:6.1f}% {share:6.1f}%  {subsystem(path)}:{name} ({os.path.basename(path)}:{line})")
+        return "\n".join(lines)
+
+class SessionProfiler:
+    """Perfis da partida ligados em tempo de execução.
+
+    Modos: 'ticks' perfila as próximas `ticks` atualizações com cProfile,
+    'episode' perfila até o fim da partida atual e 'sample' usa StackSampler
+    até ser desligado, com custo baixo o bastante para sessões longas. Ao
+    terminar, grava em out_dir o .prof (ou .folded na amostragem) e um resumo
+    com o tempo por subsistema e as top_n funções.
+    """
+
+    MODES = ('ticks', 'episode', 'sample')
+
+    def __init__(self, out_dir="runs/profiles", top_n=25, sample_interval=0.005):
+        self.out_dir = out_dir
+        self.top_n = top_n
+        self.sample_interval = sample_interval
+        self.mode = None
+        self.profiler = None
+        self.sampler = None
+        self.remaining = 0
+        self.ticks = 0
+        self.started_at = 0.0
+
+    @property
+    def active(self):
+        return self.mode is not None
+
+    def start(self, mode='ticks', ticks=600):
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de perfil desconhecido: {mode}")
+        if self.active:
+            print(f"Perfil já em andamento (modo {self.mode})")
+            return False
+        self.mode = mode
+        self.remaining = ticks
+        self.ticks = 0
+        self.started_at = time.time()
+        if mode == 'sample':
+            self.sampler = StackSampler(self.sample_interval)
+            self.sampler.start()
+        else:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        print(f"Perfil iniciado (modo {mode})")
+        return True
+
+    def tick(self, game_result=None):
+        # Chamado uma vez por atualização do jogo
+        if not self.active:
+            return None
+        self.ticks += 1
+        if self.mode == 'ticks':
+            self.remaining -= 1
+            if self.remaining <= 0:
+                return self.stop()
+        elif self.mode == 'episode' and game_result == "game_over":
+            return self.stop()
+        return None
+
+    def toggle(self, mode='ticks', ticks=600):
+        if self.active:
+            return self.stop()
+        self.start(mode, ticks)
+        return None
+
+    def stop(self):
+        # Retorna o caminho do resumo gravado
+        if not self.active:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        base = os.path.join(self.out_dir, f"profile-{stamp}-{self.mode}")
+        elapsed = time.time() - self.started_at
+        header = f"Modo {self.mode}: {self.ticks} atualizações em {elapsed:.1f}s\n"
+
+        if self.mode == 'sample':
+            self.sampler.stop()
+            self.sampler.write_folded(base + ".folded")
+            text = self.sampler.summary(self.top_n)
+            self.sampler = None
+        else:
+            self.profiler.disable()
+            self.profiler.dump_stats(base + ".prof")
+            text = self.profile_summary(self.profiler)
+            self.profiler = None
+        self.mode = None
+
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(header + text + "\n")
+        print(f"Perfil salvo em {base}.*")
+        return base + ".txt"
+
+    def profile_summary(self, profiler):
+        stats = pstats.Stats(profiler)
+        by_subsystem = Counter()
+        for (path, _, _), (_, _, own_time, _, _) in stats.stats.items():
+            by_subsystem[subsystem(path)] += own_time
+        total = max(sum(by_subsystem.values()), 1e-9)
+        lines = ["Por subsistema (tempo próprio):"]
+        lines += [f"  {name:<24}{seconds:9.3f}s {100 * seconds / total:6.1f}%" for name, seconds in by_subsystem.most_common()]
+
+        output = io.StringIO()
+        stats.stream = output
+        stats.sort_stats('cumulative').print_stats(self.top_n)
+        lines += ["", f"Top {self.top_n} funções (tempo acumulado):", output.getvalue()]
+        return "\n".join(lines)
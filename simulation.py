@@ -0,0 +1,309 @@
+import math
+import os
+import random
+import time
+import numpy as np
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from map import CellType
+from agent import AttackerPool
+from tower import Tower, TowerType, TowerScheduler
+from ai import QLearningAgent
+from attacker_group import AttackerGroup
+from fitness_cache import shared_fitness_cache
+from event_log import events
+
+TOWER_TYPES_BY_NAME = {
+    'CANNON': TowerType.CANNON,
+    'MISSILE': TowerType.MISSILE,
+    'LASER': TowerType.LASER
+}
+
+class HeadlessSimulation:
+    # Versão sem renderização do loop de Game.update, com relógio simulado.
+    # Usa geradores aleatórios próprios (seed_rngs), nunca os globais do jogo
+
+    def __init__(self, game_map, q_agent, layout=(), total_attackers=10, spawn_interval=2.0, dt=1/60, seed=None):
+        self.game_map = game_map
+        self.q_agent = q_agent
+        self.dt = dt
+        self.time = 0.0
+        self.total_attackers = total_attackers
+        self.spawn_interval = spawn_interval
+        self.last_spawn = -spawn_interval  # Primeiro atacante no primeiro tick
+
+        self.attackers = []
+        self.towers = []
+        self.tower_scheduler = TowerScheduler()
+        self.attacker_group = AttackerGroup(game_map, q_agent)
+        self.attacker_pool = AttackerPool(game_map, q_agent)
+        self.seed_rngs(seed)
+
+        self.spawned = 0
+        self.eliminated = 0
+        self.successful = 0
+
+        for tower in layout:
+            self.place_tower(tower['x'], tower['y'], TOWER_TYPES_BY_NAME[tower['type']])
+
+    @classmethod
+    def from_game(cls, game, q_agent=None):
+        # Estado atual de uma partida (mapa, torres com cooldown, atacantes);
+        # o relógio continua no tempo simulado do jogo e os spawns não acabam
+        simulation = cls.__new__(cls)
+        simulation._copy_state(game.game_map.copy(), q_agent, game.towers, game.attackers)
+        simulation.seed_rngs(None)
+        simulation.dt = 1/60
+        simulation.time = game.sim_time
+        simulation.total_attackers = math.inf
+        simulation.spawn_interval = game.attacker_spawn_interval
+        # Os spawns do jogo seguem o tempo de parede: convertido para o relógio simulado
+        simulation.last_spawn = game.sim_time - (time.time() - game.last_attacker_spawn)
+        simulation.spawned = 0
+        simulation.eliminated = 0
+        simulation.successful = 0
+        return simulation
+
+    def fork(self, q_agent=None, seed=None):
+        # Cópia independente para seguir outro futuro; q_agent=None mantém o atual.
+        # O fork tem geradores novos a partir de seed (determinístico dado o seed)
+        simulation = HeadlessSimulation.__new__(HeadlessSimulation)
+        simulation._copy_state(self.game_map.copy(), q_agent if q_agent is not None else self.q_agent,
+                               self.towers, self.attackers)
+        simulation.seed_rngs(seed)
+        simulation.dt = self.dt
+        simulation.time = self.time
+        simulation.total_attackers = self.total_attackers
+        simulation.spawn_interval = self.spawn_interval
+        simulation.last_spawn = self.last_spawn
+        simulation.spawned = self.spawned
+        simulation.eliminated = self.eliminated
+        simulation.successful = self.successful
+        return simulation
+
+    def _copy_state(self, game_map, q_agent, towers, attackers):
+        # O mapa já deve ser uma cópia; torres e atacantes são clonados sobre ele
+        self.game_map = game_map
+        self.q_agent = q_agent
+        self.attacker_group = AttackerGroup(game_map, q_agent)
+        self.attacker_pool = AttackerPool(game_map, q_agent)
+        self.tower_scheduler = TowerScheduler()
+        self.towers = []
+        for tower in towers:
+            clone = Tower(tower.grid_x, tower.grid_y, game_map, tower.tower_type)
+            clone.last_attack_time = tower.last_attack_time
+            self.towers.append(clone)
+            self.tower_scheduler.schedule(clone, clone.ready_time())
+        self.attackers = []
+        for attacker in attackers:
+            clone = attacker.clone(game_map, q_agent)
+            clone.slot_index = len(self.attackers)
+            self.attackers.append(clone)
+
+    def seed_rngs(self, seed):
+        # Spawns, exploração em lote e exploração do agente (macro-ações) saem
+        # destes geradores. O agente pode ser compartilhado entre forks da mesma
+        # raiz, então só um fork por vez deve simular com ele
+        self.rng = random.Random(seed)
+        self.attacker_group.rng = np.random.default_rng(seed)
+        if self.q_agent is not None:
+            self.q_agent.rng = self.rng
+
+    def place_tower(self, x, y, tower_type):
+        if not self.game_map.place_tower(x, y):
+            return None
+        tower = Tower(x, y, self.game_map, tower_type)
+        self.towers.append(tower)
+        self.tower_scheduler.schedule(tower, tower.ready_time())
+        return tower
+
+    def spawn_attacker(self):
+        # Mesma regra de Game.spawn_attacker
+        self.spawned += 1
+        for _ in range(20):
+            spawn_y = self.rng.randint(0, self.game_map.height - 1)
+            if self.game_map.get_cell(0, spawn_y) in [CellType.PATH, CellType.START, CellType.EMPTY]:
+                attacker = self.attacker_pool.acquire(0, spawn_y)
+                attacker.slot_index = len(self.attackers)
+                self.attackers.append(attacker)
+                return
+
+    def remove_attacker(self, attacker):
+        index = attacker.slot_index
+        if index is None:
+            return
+        last = self.attackers.pop()
+        if last is not attacker:
+            self.attackers[index] = last
+            last.slot_index = index
+        self.attacker_pool.release(attacker)
+
+    def is_finished(self):
+        return self.spawned >= self.total_attackers and not self.attackers
+
+    def step(self):
+        self.time += self.dt
+
+        if self.spawned < self.total_attackers and self.time - self.last_spawn >= self.spawn_interval:
+            self.spawn_attacker()
+            self.last_spawn = self.time
+
+        results = self.attacker_group.step(self.attackers)
+        finished = []
+        for attacker, result in zip(self.attackers, results):
+            if result == "reached_end":
+                finished.append(attacker)
+                self.successful += 1
+            elif result == "eliminated":
+                finished.append(attacker)
+                self.eliminated += 1
+        for attacker in finished:
+            self.remove_attacker(attacker)
+
+        for tower in self.tower_scheduler.pop_ready(self.time):
+            target = tower.find_target(self.attackers)
+            if target and tower.attack(target, self.time) > 0 and target.health <= 0:
+                self.eliminated += 1
+                self.remove_attacker(target)
+            self.tower_scheduler.schedule(tower, tower.ready_time())
+
+    def run(self, max_ticks):
+        for _ in range(max_ticks):
+            if self.is_finished():
+                break
+            self.step()
+        return self.get_results()
+
+    def get_results(self):
+        total = self.eliminated + self.successful
+        return {
+            'eliminated_attackers': self.eliminated,
+            'successful_attackers': self.successful,
+            'defense_efficiency': (self.eliminated / total) * 100 if total > 0 else 0
+        }
+
+def run_rollout(game_map, q_table, layout, seed, config):
+    # Um rollout determinístico (dado o seed) de um layout; não altera o mapa
+    # e usa geradores próprios, nunca os globais de quem chamou
+    q_agent = QLearningAgent(epsilon=config['epsilon'], q_table_file=None)
+    q_agent.q_table = defaultdict(lambda: defaultdict(float), {k: defaultdict(float, v) for k, v in q_table.items()})
+    simulation = HeadlessSimulation(
+        game_map.copy(), q_agent, layout,
+        total_attackers=config['total_attackers'],
+        spawn_interval=config['spawn_interval'],
+        seed=seed
+    )
+    # Os eventos dos atacantes não devem inundar a saída durante rollouts
+    with events.muted():
+        return simulation.run(config['max_ticks'])
+
+def run_rollout_batch(game_map, q_table, jobs, config):
+    # Executado em um processo do pool: vários (layout, seed) com o mesmo snapshot
+    return [run_rollout(game_map, q_table, layout, seed, config) for layout, seed in jobs]
+
+class LayoutEvaluator:
+    """Avalia layouts de torres com K rollouts sem renderização por layout.
+
+    Os rollouts são distribuídos num pool de processos e os resultados ficam
+    no cache de fitness compartilhado, por (versão do mapa, política, seed,
+    layout). A política é uma cópia da tabela Q refeita só depois de
+    policy_refresh atualizações Q: enquanto ela vale, layouts repetidos entre
+    gerações saem do cache.
+    """
+
+    def __init__(self, game_map, q_agent=None, rollouts=4, max_workers=None, total_attackers=10,
+                 spawn_interval=2.0, max_ticks=3600, epsilon=0.05, base_seed=0, policy_refresh=20000):
+        self.game_map = game_map
+        self.q_agent = q_agent
+        self.rollouts = rollouts
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self.base_seed = base_seed
+        self.config = {
+            'total_attackers': total_attackers,
+            'spawn_interval': spawn_interval,
+            'max_ticks': max_ticks,
+            'epsilon': epsilon
+        }
+        self.cache = shared_fitness_cache
+        self.executor = None
+        self.policy_refresh = policy_refresh
+        self.policy_table = None  # Cópia da tabela Q usada pelos rollouts
+        self.policy_revision = None  # QLearningAgent.revision quando a cópia foi feita
+
+    def _get_executor(self):
+        if self.executor is None and self.max_workers > 1:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self.executor
+
+    def seeds(self):
+        return [self.base_seed + k for k in range(self.rollouts)]
+
+    def _policy(self):
+        # (tabela Q dos rollouts, revisão dela); a revisão entra na chave do cache
+        if self.q_agent is None:
+            return {}, None
+        revision = self.q_agent.revision
+        if self.policy_table is None or revision - self.policy_revision >= self.policy_refresh:
+            self.policy_table = {k: dict(v) for k, v in list(self.q_agent.q_table.items())}
+            self.policy_revision = revision
+        return self.policy_table, self.policy_revision
+
+    def _key(self, layout, seed, revision):
+        return self.cache.key('rollout', (self.game_map.version, revision, seed), layout)
+
+    def is_cached(self, layout):
+        # True se todos os rollouts deste layout já estão no cache (avaliação gratuita)
+        _, revision = self._policy()
+        return all(self._key(layout, seed, revision) in self.cache for seed in self.seeds())
+
+    def evaluate(self, layouts):
+        # Retorna, para cada layout, a média de eliminados/bem-sucedidos/eficiência
+        # Política lida uma vez: a cópia pode ser refeita durante a avaliação
+        q_table, revision = self._policy()
+        results = {}
+        pending = []
+        for layout in layouts:
+            for seed in self.seeds():
+                key = self._key(layout, seed, revision)
+                if key in results:
+                    continue
+                results[key] = self.cache.get(key)
+                if results[key] is None:
+                    pending.append((layout, seed))
+
+        if pending:
+            for (layout, seed), result in zip(pending, self._run(pending, q_table)):
+                key = self._key(layout, seed, revision)
+                results[key] = result
+                self.cache.put(key, result)
+
+        return [self._aggregate([results[self._key(layout, seed, revision)] for seed in self.seeds()]) for layout in layouts]
+
+    def _run(self, jobs, q_table):
+        map_snapshot = self.game_map.copy()
+        executor = self._get_executor()
+        if executor is None:
+            return run_rollout_batch(map_snapshot, q_table, jobs, self.config)
+
+        # Um lote por processo para enviar o snapshot do mapa e da tabela Q poucas vezes
+        chunk_size = -(-len(jobs) // self.max_workers)
+        chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        futures = [executor.submit(run_rollout_batch, map_snapshot, q_table, chunk, self.config) for chunk in chunks]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def _aggregate(self, results):
+        n = len(results)
+        return {
+            'eliminated_attackers': sum(r['eliminated_attackers'] for r in results) / n,
+            'successful_attackers': sum(r['successful_attackers'] for r in results) / n,
+            'defense_efficiency': sum(r['defense_efficiency'] for r in results) / n,
+            'rollouts': n
+        }
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
@@ -0,0 +1,173 @@
+import math
+import numpy as np
+from tower import TowerType
+
+# Tipos de torre pelo nome usado nos layouts do GeneticAlgorithmOptimizer
+TOWER_TYPE_NAMES = ['CANNON', 'MISSILE', 'LASER']
+TOWER_TYPES = [TowerType.CANNON, TowerType.MISSILE, TowerType.LASER]
+
+def layout_features(layout, game_map):
+    """Vetor de características baratas de um layout de torres.
+
+    Aceita dicts {'x', 'y', 'type'} ou tuplas (x, y) (tipo desconhecido usa o
+    alcance padrão). Mede quanto do caminho dos atacantes fica ao alcance das
+    torres e da área transitável coberta, a sobreposição e o espalhamento das
+    torres e a composição de tipos.
+    """
+    path = np.array(game_map.path_points, dtype=float).reshape(-1, 2)
+    path_length = max(len(path), 1)
+    # Células por onde os atacantes conseguem chegar ao fim
+    flow = np.array(game_map.get_flow_field(), dtype=float)
+    ys, xs = np.nonzero(np.isfinite(flow))
+    walkable = np.stack([xs, ys], axis=1)
+    walkable_covered = np.zeros(len(walkable), dtype=bool)
+    type_counts = [0, 0, 0]
+    covered = np.zeros(len(path), dtype=bool)
+    exposure = 0.0
+    damage_exposure = 0.0
+    end_distance = 0.0
+
+    for gene in layout:
+        if isinstance(gene, dict):
+            x, y, name = gene['x'], gene['y'], gene.get('type')
+        else:
+            x, y, name = gene[0], gene[1], None
+        tower_type = TOWER_TYPES[TOWER_TYPE_NAMES.index(name)] if name in TOWER_TYPE_NAMES else None
+        if tower_type is not None:
+            type_counts[TOWER_TYPE_NAMES.index(name)] += 1
+        tower_range = tower_type['range'] if tower_type is not None else 3
+        dps = tower_type['damage'] * tower_type['attack_speed'] if tower_type is not None else 0
+
+        in_range = ((path - (x, y)) ** 2).sum(axis=1) <= tower_range ** 2
+        covered |= in_range
+        walkable_covered |= ((walkable - (x, y)) ** 2).sum(axis=1) <= tower_range ** 2
+        exposure += in_range.sum()
+        damage_exposure += dps * in_range.sum()
+        if game_map.end_pos:
+            end_distance += abs(x - game_map.end_pos[0]) + abs(y - game_map.end_pos[1])
+
+    num_towers = len(layout)
+    positions = np.array([(g['x'], g['y']) if isinstance(g, dict) else g[:2] for g in layout], dtype=float).reshape(-1, 2)
+    spread = 0.0
+    if num_towers > 1:
+        spread = np.abs(positions[:, None, :] - positions[None, :, :]).sum(axis=2).sum() / (num_towers * (num_towers - 1))
+
+    return np.array([
+        1.0,
+        num_towers,
+        *type_counts,
+        covered.sum() / path_length,
+        exposure / path_length,
+        damage_exposure / path_length / 10,
+        end_distance / max(num_towers, 1) / (game_map.width + game_map.height),
+        sum(1 for count in type_counts if count),
+        spread / 10,
+        walkable_covered.sum() / max(len(walkable), 1)
+    ])
+
+class SurrogateModel:
+    """Regressão linear bayesiana sobre layout_features, ajustada online.
+
+    Cada rollout completo vira uma amostra (características, fitness). As
+    estatísticas suficientes (XᵀX, Xᵀy, yᵀy) são acumuladas, então observe e
+    predict custam O(d²) por layout. A variância preditiva vem da covariância
+    posterior dos pesos mais o ruído residual.
+
+    O modelo só é usado para podar avaliações depois de min_samples amostras e
+    enquanto o erro nas amostras novas (medido antes de incorporá-las) ficar
+    abaixo de max_error vezes o desvio padrão das fitness, isto é, enquanto
+    prevê melhor do que a média. Mesmo confiável, um candidato só é descartado
+    se nem o seu valor otimista (média + exploration * desvio) alcança a
+    melhor fitness já medida.
+    """
+
+    def __init__(self, num_features=12, prior=1.0, min_samples=20, screen_fraction=0.25,
+                 exploration=0.25, max_error=1.0, error_decay=0.9):
+        self.num_features = num_features
+        self.prior = prior
+        self.min_samples = min_samples
+        self.screen_fraction = screen_fraction  # Fração enviada aos rollouts completos
+        self.exploration = exploration  # Peso do desvio padrão no ranking (UCB)
+        self.max_error = max_error
+        self.error_decay = error_decay
+
+        self.xtx = np.zeros((num_features, num_features))
+        self.xty = np.zeros(num_features)
+        self.yty = 0.0
+        self.y_sum = 0.0
+        self.samples = 0
+        self.weights = np.zeros(num_features)
+        self.covariance = np.eye(num_features) / prior
+        self.noise_variance = 1.0
+        self.recent_error = None
+
+        self.evaluated = 0
+        self.estimated = 0
+
+    def observe(self, features, fitness):
+        # Registra o erro de previsão antes de aprender com a amostra
+        if self.samples >= self.num_features:
+            mean, _ = self.predict(features[None, :])
+            error = (float(mean[0]) - fitness) ** 2
+            if self.recent_error is None:
+                self.recent_error = error
+            else:
+                self.recent_error = self.error_decay * self.recent_error + (1 - self.error_decay) * error
+
+        self.xtx += np.outer(features, features)
+        self.xty += features * fitness
+        self.yty += fitness * fitness
+        self.y_sum += fitness
+        self.samples += 1
+        self._fit()
+
+    def _fit(self):
+        precision = self.xtx + self.prior * np.eye(self.num_features)
+        self.covariance = np.linalg.inv(precision)
+        self.weights = self.covariance @ self.xty
+        residual = self.yty - 2 * self.weights @ self.xty + self.weights @ self.xtx @ self.weights
+        self.noise_variance = max(residual, 1e-9) / max(self.samples - self.num_features, 1)
+
+    def predict(self, features):
+        # Retorna (média, desvio padrão) de cada linha
+        mean = features @ self.weights
+        variance = self.noise_variance * (1 + np.einsum('ij,jk,ik->i', features, self.covariance, features))
+        return mean, np.sqrt(variance)
+
+    def fitness_std(self):
+        if self.samples < 2:
+            return 0.0
+        mean = self.y_sum / self.samples
+        return math.sqrt(max(self.yty / self.samples - mean * mean, 0.0))
+
+    def is_trusted(self):
+        if self.samples < self.min_samples or self.recent_error is None:
+            return False
+        scale = self.fitness_std()
+        return scale > 0 and math.sqrt(self.recent_error) <= self.max_error * scale
+
+    def screen(self, features, threshold=None, always=()):
+        # Índices que devem ir para a avaliação completa; None = todos.
+        # Entram os melhores screen_fraction pelo valor otimista, os que ainda
+        # podem superar threshold e os de always
+        if not self.is_trusted():
+            return None
+        mean, std = self.predict(features)
+        optimistic = mean + self.exploration * std
+        budget = max(1, math.ceil(self.screen_fraction * len(features)))
+        ranked = np.argsort(-optimistic, kind='stable')
+        chosen = set(ranked[:budget].tolist()) | set(always)
+        if threshold is not None:
+            chosen |= set(np.flatnonzero(optimistic >= threshold).tolist())
+        return sorted(chosen)
+
+    def get_stats(self):
+        total = self.evaluated + self.estimated
+        return {
+            'samples': self.samples,
+            'trusted': self.is_trusted(),
+            'rmse': math.sqrt(self.recent_error) if self.recent_error is not None else None,
+            'evaluated': self.evaluated,
+            'estimated': self.estimated,
+            'pruned_fraction': self.estimated / total if total else 0
+        }
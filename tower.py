@@ -1,7 +1,11 @@
 import pygame
+import heapq
 import math # Necessário para o cálculo de distância
 import random
 import time
+import numpy as np
+from fitness_cache import shared_fitness_cache, environment_fingerprint
+from ga_engine import GenomeEngine, EMPTY, encode_cells, decode_cell
 
 class TowerType:
     CANNON = {
@@ -33,6 +37,16 @@ class TowerType:
 
 class Tower:
     DEFAULT_RANGE = 3
+
+    __slots__ = (
+        'grid_x', 'grid_y', 'pixel_x', 'pixel_y', 'game_map', 'tower_type',
+        'last_attack_time', 'target', 'total_damage_dealt', 'enemies_killed',
+        'shots_fired', 'fitness_score', 'generation'
+    )
+
+    # Renderização
+    size = 18
+    range_color = (255, 255, 255, 50)  # Branco semi-transparente
     
     def __init__(self, grid_x, grid_y, game_map, tower_type=None):
         # Posição no mapa
@@ -50,17 +64,9 @@ class Tower:
         else:
             self.tower_type = tower_type
         
-        # Atributos da torre
-        self.damage = self.tower_type['damage']
-        self.range = self.tower_type['range']
-        self.attack_speed = self.tower_type['attack_speed']
-        self.cost = self.tower_type['cost']
-        self.color = self.tower_type['color']
-        
         # Estado de ataque
         self.last_attack_time = 0
         self.target = None
-        self.attack_cooldown = 1.0 / self.attack_speed
         
         # Estatísticas
         self.total_damage_dealt = 0
@@ -70,10 +76,31 @@ class Tower:
         # Algoritmo genético (fitness)
         self.fitness_score = 0
         self.generation = 0
-        
-        # Renderização
-        self.size = 18
-        self.range_color = (255, 255, 255, 50)  # Branco semi-transparente
+
+    # Atributos da torre lidos diretamente do TowerType, sem cópia por instância
+    @property
+    def damage(self):
+        return self.tower_type['damage']
+
+    @property
+    def range(self):
+        return self.tower_type['range']
+
+    @property
+    def attack_speed(self):
+        return self.tower_type['attack_speed']
+
+    @property
+    def cost(self):
+        return self.tower_type['cost']
+
+    @property
+    def color(self):
+        return self.tower_type['color']
+
+    @property
+    def attack_cooldown(self):
+        return 1.0 / self.tower_type['attack_speed']
     
     def calculate_distance(self, target):
         
@@ -119,13 +146,20 @@ class Tower:
         self.target = best_target
         return best_target
     
-    def can_attack(self):
+    def can_attack(self, current_time=None):
         
-        current_time = time.time()
+        if current_time is None:
+            current_time = time.time()
         return current_time - self.last_attack_time >= self.attack_cooldown
+
+    def ready_time(self):
+        # Instante a partir do qual a torre pode atacar novamente
+        return self.last_attack_time + self.attack_cooldown
     
-    def attack(self, target):
-        if not self.can_attack() or not target or target.health <= 0:
+    def attack(self, target, current_time=None):
+        if current_time is None:
+            current_time = time.time()
+        if not self.can_attack(current_time) or not target or target.health <= 0:
             return 0
 
         if not self.is_in_range(target):
@@ -136,7 +170,7 @@ class Tower:
 
         self.total_damage_dealt += damage_dealt
         self.shots_fired += 1
-        self.last_attack_time = time.time()
+        self.last_attack_time = current_time
 
         if target.health <= 0:
             self.enemies_killed += 1
@@ -170,14 +204,6 @@ class Tower:
             # Mutar tipo de torre
             tower_types = [TowerType.CANNON, TowerType.MISSILE, TowerType.LASER]
             self.tower_type = random.choice(tower_types)
-            
-            # Atualizar atributos
-            self.damage = self.tower_type['damage']
-            self.range = self.tower_type['range']
-            self.attack_speed = self.tower_type['attack_speed']
-            self.cost = self.tower_type['cost']
-            self.color = self.tower_type['color']
-            self.attack_cooldown = 1.0 / self.attack_speed
     
     def crossover(self, other_tower):
         
@@ -190,14 +216,6 @@ class Tower:
         else:
             new_tower.tower_type = other_tower.tower_type
         
-        # Atualizar atributos
-        new_tower.damage = new_tower.tower_type['damage']
-        new_tower.range = new_tower.tower_type['range']
-        new_tower.attack_speed = new_tower.tower_type['attack_speed']
-        new_tower.cost = new_tower.tower_type['cost']
-        new_tower.color = new_tower.tower_type['color']
-        new_tower.attack_cooldown = 1.0 / new_tower.attack_speed
-        
         new_tower.generation = max(self.generation, other_tower.generation) + 1
         
         return new_tower
@@ -261,8 +279,46 @@ class Tower:
         # Desenhar borda do alcance
         pygame.draw.circle(screen, (255, 255, 255), center, range_radius, 1)
 
+class TowerScheduler:
+    # Min-heap dos instantes em que cada torre sai do cooldown; só as torres
+    # prontas são consultadas para escolher alvo a cada tick
+    
+    def __init__(self):
+        self.heap = []
+        self.entries = {}  # torre -> sequência da entrada válida no heap
+        self.counter = 0
+
+    def schedule(self, tower, ready_time):
+        self.counter += 1
+        self.entries[tower] = self.counter
+        heapq.heappush(self.heap, (ready_time, self.counter, tower))
+
+    def remove(self, tower):
+        # Remoção preguiçosa: a entrada antiga é descartada ao sair do heap
+        self.entries.pop(tower, None)
+
+    def pop_ready(self, current_time):
+        ready = []
+        while self.heap and self.heap[0][0] <= current_time:
+            _, seq, tower = heapq.heappop(self.heap)
+            if self.entries.get(tower) == seq:
+                del self.entries[tower]
+                ready.append(tower)
+        return ready
+
+    def clear(self):
+        self.heap.clear()
+        self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
 class GeneticAlgorithm:
+    # Adaptador de GenomeEngine: o genoma guarda (célula, tipo) e os objetos
+    # Tower só são criados ao decodificar a nova geração
     
+    TOWER_TYPES = [TowerType.CANNON, TowerType.MISSILE, TowerType.LASER]
+    MAX_TOWERS = 10
     
     def __init__(self, game_map):
         self.game_map = game_map
@@ -270,29 +326,47 @@ class GeneticAlgorithm:
         self.mutation_rate = 0.1
         self.crossover_rate = 0.7
         self.generation = 0
+        self.engine = GenomeEngine(
+            num_genes=self.MAX_TOWERS, num_types=len(self.TOWER_TYPES), population_size=self.population_size,
+            mutation_rate=self.mutation_rate, crossover_rate=self.crossover_rate,
+            type_mutation_rate=self.mutation_rate, resize_rate=self.mutation_rate, min_genes=1
+        )
         
-    def create_random_tower_layout(self):
-        
+    def candidate_cells(self):
+        return encode_cells(self.game_map.placement_cells(), self.game_map.width)
+    
+    def encode(self, population):
+        genomes = np.full((len(population), self.MAX_TOWERS, 2), EMPTY, dtype=np.int64)
+        genomes[:, :, 1] = 0
+        for i, layout in enumerate(population):
+            for j, tower in enumerate(layout[:self.MAX_TOWERS]):
+                tower_type = next((k for k, t in enumerate(self.TOWER_TYPES) if t == tower.tower_type), 0)
+                genomes[i, j] = (tower.grid_y * self.game_map.width + tower.grid_x, tower_type)
+        return genomes
+    
+    def decode(self, genome):
         towers = []
-        num_towers = random.randint(5, 10)
-        
-        for _ in range(num_towers):
-            attempts = 0
-            while attempts < 50:  # Evitar loop infinito
-                x = random.randint(0, self.game_map.width - 1)
-                y = random.randint(0, self.game_map.height - 1)
-                
-                if self.game_map.can_place_tower(x, y):
-                    tower = Tower(x, y, self.game_map)
-                    towers.append(tower)
-                    break
-                
-                attempts += 1
-        
+        for cell, tower_type in genome.tolist():
+            if cell != EMPTY:
+                x, y = decode_cell(cell, self.game_map.width)
+                towers.append(Tower(x, y, self.game_map, self.TOWER_TYPES[tower_type]))
         return towers
     
+    def create_random_tower_layout(self):
+        
+        genome = self.engine.random_population(self.candidate_cells(), size=1, min_genes=5,
+                                               max_genes=self.MAX_TOWERS)[0]
+        return self.decode(genome)
+    
     def evaluate_fitness(self, tower_layout, simulation_results):
         
+        key = shared_fitness_cache.key(
+            'tower_layout', environment_fingerprint(self.game_map, extra=simulation_results), tower_layout
+        )
+        cached = shared_fitness_cache.get(key)
+        if cached is not None:
+            return cached
+
         total_fitness = 0
         
         for tower in tower_layout:
@@ -304,106 +378,16 @@ class GeneticAlgorithm:
             defense_efficiency = simulation_results.get('defense_efficiency', 0)
             total_fitness += defense_efficiency * 2
         
+        shared_fitness_cache.put(key, total_fitness)
         return total_fitness
     
-    def selection(self, population, fitness_scores):
-        
-        selected = []
-        tournament_size = 3
-        
-        for _ in range(len(population)):
-            tournament = random.sample(list(zip(population, fitness_scores)), tournament_size)
-            winner = max(tournament, key=lambda x: x[1])
-            selected.append(winner[0])
-        
-        return selected
-    
-    def crossover(self, parent1, parent2):
-        
-        if random.random() > self.crossover_rate:
-            return parent1, parent2
-        
-        # Combinar torres dos dois pais
-        child1_towers = []
-        child2_towers = []
-        
-        # Pegar torres de ambos os pais aleatoriamente
-        all_positions = set()
-        for tower in parent1 + parent2:
-            all_positions.add((tower.grid_x, tower.grid_y))
-        
-        for pos in all_positions:
-            if self.game_map.can_place_tower(pos[0], pos[1]):
-                # Encontrar torres nesta posição
-                towers_at_pos = []
-                for tower in parent1 + parent2:
-                    if (tower.grid_x, tower.grid_y) == pos:
-                        towers_at_pos.append(tower)
-                
-                if towers_at_pos:
-                    # Escolher aleatoriamente para cada filho
-                    if random.random() < 0.5 and len(child1_towers) < 10:
-                        selected_tower = random.choice(towers_at_pos)
-                        new_tower = Tower(pos[0], pos[1], self.game_map, selected_tower.tower_type)
-                        child1_towers.append(new_tower)
-                    
-                    if random.random() < 0.5 and len(child2_towers) < 10:
-                        selected_tower = random.choice(towers_at_pos)
-                        new_tower = Tower(pos[0], pos[1], self.game_map, selected_tower.tower_type)
-                        child2_towers.append(new_tower)
-        
-        return child1_towers, child2_towers
-    
-    def mutation(self, tower_layout):
-        
-        for tower in tower_layout:
-            if random.random() < self.mutation_rate:
-                tower.mutate()
-        
-        # Adicionar/remover torres aleatoriamente
-        if random.random() < self.mutation_rate:
-            if len(tower_layout) > 1 and random.random() < 0.5:
-                # Remover torre aleatória
-                tower_layout.pop(random.randint(0, len(tower_layout) - 1))
-            elif len(tower_layout) < 10:
-                # Adicionar nova torre
-                attempts = 0
-                while attempts < 20:
-                    x = random.randint(0, self.game_map.width - 1)
-                    y = random.randint(0, self.game_map.height - 1)
-                    
-                    if self.game_map.can_place_tower(x, y):
-                        new_tower = Tower(x, y, self.game_map)
-                        tower_layout.append(new_tower)
-                        break
-                    
-                    attempts += 1
-        
-        return tower_layout
-    
     def evolve_generation(self, population, simulation_results):
         
         # Avaliar fitness
-        fitness_scores = []
-        for layout in population:
-            fitness = self.evaluate_fitness(layout, simulation_results)
-            fitness_scores.append(fitness)
-        
-        # Seleção
-        selected = self.selection(population, fitness_scores)
-        
-        # Crossover e mutação
-        new_population = []
-        for i in range(0, len(selected), 2):
-            parent1 = selected[i]
-            parent2 = selected[(i + 1) % len(selected)]
-            
-            child1, child2 = self.crossover(parent1, parent2)
-            
-            child1 = self.mutation(child1)
-            child2 = self.mutation(child2)
-            
-            new_population.extend([child1, child2])
+        fitness_scores = [self.evaluate_fitness(layout, simulation_results) for layout in population]
+        
+        # Seleção, crossover e mutação sobre os genomas de toda a população
+        genomes, _ = self.engine.next_generation(self.encode(population), fitness_scores, self.candidate_cells())
         
         self.generation += 1
-        return new_population[:self.population_size]
\ No newline at end of file
+        return [self.decode(genome) for genome in genomes[:self.population_size]]
@@ -0,0 +1,104 @@
+import numpy as np
+from ga_engine import EMPTY
+from genetic_tower import attacker_positions
+
+def range_offsets(radius, metric='manhattan'):
+    # Deslocamentos (dx, dy) dentro do alcance de uma torre
+    offsets = []
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            if metric == 'manhattan':
+                inside = abs(dx) + abs(dy) <= radius
+            else:
+                inside = dx * dx + dy * dy <= radius * radius
+            if inside:
+                offsets.append((dx, dy))
+    return offsets
+
+class TrafficHeatmap:
+    """Mapa de calor das células visitadas pelos atacantes, com decaimento.
+
+    Cada chamada de record soma as posições atuais dos atacantes; visitas
+    antigas perdem peso por um fator decay a cada registro. O decaimento é
+    aplicado de forma preguiçosa: em vez de multiplicar o grid inteiro, o peso
+    das novas visitas cresce e o grid é dividido por esse peso na leitura.
+
+    score_genomes dá a nota de vários layouts de uma vez: o calor da união das
+    células ao alcance das suas torres, lido por uma tabela de deslocamentos
+    pré-calculada para cada alcance.
+    """
+
+    def __init__(self, game_map, decay=0.999):
+        self.game_map = game_map
+        self.decay = decay
+        self.revision = 0  # Nunca volta a zero, para não confundir o cache de fitness
+        self._offsets = {}
+        self.reset()
+
+    def reset(self):
+        self.shape = (self.game_map.height, self.game_map.width)
+        self.counts = np.zeros(self.shape)
+        self.weight = 1.0
+        self.revision += 1
+
+    def record(self, attackers):
+        if (self.game_map.height, self.game_map.width) != self.shape:
+            self.reset()
+        self.weight /= self.decay
+        positions = attacker_positions(attackers)
+        if len(positions):
+            xs, ys = positions[:, 0], positions[:, 1]
+            inside = (xs >= 0) & (xs < self.shape[1]) & (ys >= 0) & (ys < self.shape[0])
+            np.add.at(self.counts, (ys[inside], xs[inside]), self.weight)
+        # Renormaliza antes que o peso estoure a precisão do float
+        if self.weight > 1e12:
+            self.counts /= self.weight
+            self.weight = 1.0
+        self.revision += 1
+
+    @property
+    def heat(self):
+        return self.counts / self.weight
+
+    @property
+    def total(self):
+        return float(self.counts.sum() / self.weight)
+
+    def offsets(self, radius, metric='manhattan'):
+        # Tabela (k, 2) de deslocamentos ao alcance de uma torre, calculada uma vez por (raio, métrica)
+        key = (radius, metric)
+        if key not in self._offsets:
+            self._offsets[key] = np.array(range_offsets(radius, metric), dtype=np.int64)
+        return self._offsets[key]
+
+    def score_genomes(self, cells, radius, metric='manhattan'):
+        # cells: array (layouts, torres) de índices de célula, EMPTY = sem torre.
+        # Nota = calor da união das áreas cobertas: tráfego coberto por duas torres
+        # conta uma vez. Custo proporcional a torres x alcance, não ao tamanho do grid
+        if len(cells) == 0:
+            return np.zeros(0)
+        height, width = self.shape
+        cells = np.asarray(cells, dtype=np.int64).reshape(len(cells), -1)
+        offsets = self.offsets(radius, metric)
+        xs = (cells % width)[:, :, None] + offsets[:, 0]
+        ys = (cells // width)[:, :, None] + offsets[:, 1]
+        inside = (cells != EMPTY)[:, :, None] & (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        covered = np.where(inside, ys * width + xs, -1).reshape(len(cells), -1)
+        # Células repetidas (áreas sobrepostas) ficam lado a lado depois de ordenar
+        covered.sort(axis=1)
+        first = np.ones(covered.shape, dtype=bool)
+        first[:, 1:] = covered[:, 1:] != covered[:, :-1]
+        heat = self.heat.ravel()
+        return np.where(first & (covered >= 0), heat[np.maximum(covered, 0)], 0.0).sum(axis=1)
+
+    def snapshot(self):
+        # Cópia congelada para a busca em segundo plano
+        copy = TrafficHeatmap.__new__(TrafficHeatmap)
+        copy.game_map = None
+        copy.decay = self.decay
+        copy.shape = self.shape
+        copy.counts = self.counts.copy()
+        copy.weight = self.weight
+        copy.revision = self.revision
+        copy._offsets = self._offsets
+        return copy
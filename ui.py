@@ -23,9 +23,13 @@ class UI:
         self.font_large = pygame.font.Font(None, 48)
         self.font_medium = pygame.font.Font(None, 32)
         self.font_small = pygame.font.Font(None, 24)
+        self.font_mono = pygame.font.SysFont("monospace", 14)  # Painel de tempos
         
         # Estado do menu
         self.show_mode_selection = False
+
+        # Painel de tempos por fase (F3)
+        self.show_timing = False
         
         # Botões do menu principal
         self.menu_buttons = {
@@ -178,6 +182,25 @@ class UI:
         mode_surface = self.font_small.render(mode_text, True, self.YELLOW)
         screen.blit(mode_surface, (10, 35))
     
+    def draw_timing_overlay(self, screen, timings, info):
+        # timings: [(fase, p50 ms, p99 ms, média ms)]; info: linhas de contexto (FPS, contagens)
+        lines = list(info) + [f"{'fase':<16}{'p50':>8}{'p99':>8}"]
+        lines += [f"{name:<16}{p50:>8.2f}{p99:>8.2f}" for name, p50, p99, _ in timings]
+        if not timings:
+            lines.append("(coletando...)")
+
+        font = self.font_mono
+        line_height = font.get_linesize()
+        width = max(font.size(line)[0] for line in lines) + 16
+        panel = pygame.Surface((width, line_height * len(lines) + 12))
+        panel.set_alpha(200)
+        panel.fill(self.BLACK)
+        x = self.screen_width - width - 10
+        screen.blit(panel, (x, 70))
+        for i, line in enumerate(lines):
+            color = self.YELLOW if i < len(info) else self.WHITE
+            screen.blit(font.render(line, True, color), (x + 8, 76 + i * line_height))
+
     def draw_pause_overlay(self, screen):
         
         # Overlay semi-transparente